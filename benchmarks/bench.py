@@ -0,0 +1,345 @@
+# VaultSafe benchmark harness
+#
+#   python -m benchmarks.bench --out run.json            # run everything
+#   python -m benchmarks.bench --only io --sizes 10 1000
+#   python -m benchmarks.bench --compare base.json run.json --threshold 0.15
+#
+# Every metric is "lower is better" (seconds per operation, KiB of RSS) so
+# comparisons are uniform. I/O and GUI cases run in a fresh spawned process
+# each, which keeps peak RSS per case honest and imports from leaking
+# between cases.
+
+import os
+import sys
+import json
+import time
+import base64
+import random
+import platform
+import argparse
+import tempfile
+import statistics
+import multiprocessing
+from queue import Empty
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DEFAULT_SIZES = (10, 1_000, 100_000)
+GUI_SIZE = 1_000
+SEED = 1337
+CASE_TIMEOUT = 900  # seconds an isolated case may run before it is killed
+
+
+# === Synthetic data ===
+
+def synthetic_record(rng: random.Random) -> dict:
+    # Same shape and sizes as a real v1 record; contents are random bytes
+    return {
+        "salt": base64.b64encode(rng.randbytes(16)).decode(),
+        "iv": base64.b64encode(rng.randbytes(12)).decode(),
+        "ciphertext": base64.b64encode(rng.randbytes(rng.randint(48, 96))).decode(),
+    }
+
+def synthetic_vault(size: int, seed: int = SEED) -> dict:
+    rng = random.Random(seed)
+    return {f"site{i:06d}.example": synthetic_record(rng) for i in range(size)}
+
+
+# === Helpers ===
+
+def _median_time(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+def _peak_rss_kib() -> int | None:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak  # bytes on macOS
+
+def _run_isolated(target, *args) -> dict:
+    # A case that crashes, hangs or exits non-zero is reported under
+    # "_failed" rather than blocking the run
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=target, args=(queue, *args))
+    proc.start()
+    deadline = time.monotonic() + CASE_TIMEOUT
+    result = None
+    while result is None and time.monotonic() < deadline:
+        try:
+            result = queue.get(timeout=1)
+        except Empty:
+            if not proc.is_alive():
+                break
+    if result is None:
+        try:
+            result = queue.get_nowait()  # put just before exiting
+        except Empty:
+            pass
+    if result is None and proc.is_alive():
+        proc.kill()
+        proc.join()
+        return {"_failed": [f"{target.__name__}{args}: timed out after {CASE_TIMEOUT} s"]}
+    proc.join()
+    if result is None or proc.exitcode != 0:
+        return {"_failed": [f"{target.__name__}{args}: exit code {proc.exitcode}"]}
+    return result
+
+def _merge(results: dict, case: dict) -> None:
+    results.setdefault("_failed", []).extend(case.pop("_failed", []))
+    results.update(case)
+
+
+# === Crypto ===
+
+def bench_crypto(repeat: int, samples: int) -> dict:
+    from core import crypto
+
+    crypto.disable_key_cache()
+    salt = os.urandom(crypto.SALT_LENGTH)
+    data = {"username": "bench@example.com", "password": "correct horse battery staple"}
+    results = {
+        "kdf.derive_key": _median_time(lambda: crypto.derive_key("bench-password", salt), repeat),
+    }
+
+    records = []
+    def encrypt_batch():
+        records[:] = [crypto.encrypt_entry("bench-password", data) for _ in range(samples)]
+    results["crypto.encrypt_entry"] = _median_time(encrypt_batch, repeat) / samples
+    results["crypto.decrypt_entry"] = _median_time(
+        lambda: [crypto.decrypt_entry("bench-password", *r) for r in records], repeat) / samples
+
+    vault_salt = os.urandom(crypto.SALT_LENGTH)
+    vault_key = crypto.derive_key("bench-password", vault_salt)
+    vault_keys = {crypto.vault_key_id({"vs": base64.b64encode(vault_salt).decode()}): vault_key}
+    v2_records = []
+    def encrypt_v2_batch():
+        v2_records[:] = [crypto.encrypt_record("bench-password", data, vault_salt, vault_key)
+                         for _ in range(samples)]
+    results["crypto.encrypt_record_v2"] = _median_time(encrypt_v2_batch, repeat) / samples
+    results["crypto.decrypt_record_v2"] = _median_time(
+        lambda: [crypto.decrypt_record("bench-password", r, vault_keys) for r in v2_records], repeat) / samples
+    results["crypto.encrypt_record_v2_indexed"] = _median_time(
+        lambda: [crypto.encrypt_record("bench-password", data, vault_salt, vault_key, blind_index=True)
+                 for _ in range(samples)], repeat) / samples
+    return results
+
+
+# === Vault I/O ===
+
+def _io_case(queue, size: int, repeat: int) -> None:
+    from core import vault_io
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        vault_io.VAULT_FILE = os.path.join(tmp, "vault.json")
+        vault = synthetic_vault(size)
+        with open(vault_io.VAULT_FILE, "w", encoding="utf-8") as f:
+            json.dump(vault, f, indent=2)
+
+        def load_cold():
+            # A fresh backend has nothing cached, so this is a full parse
+            vault_io.JsonLogBackend(vault_io.VAULT_FILE).load()
+        results[f"io.load_vault[{size}]"] = _median_time(load_cold, repeat)
+        results[f"io.load_vault_warm[{size}]"] = _median_time(vault_io.load_vault, repeat)
+
+        rng = random.Random(SEED + 1)
+        def get_one():
+            vault_io.get_entry(f"site{rng.randrange(size):06d}.example")
+        results[f"io.get_entry[{size}]"] = _median_time(get_one, repeat)
+
+        def save_one_change():
+            vault[f"site{rng.randrange(size):06d}.example"] = synthetic_record(rng)
+            vault_io.save_vault(vault)
+        results[f"io.save_vault_one_change[{size}]"] = _median_time(save_one_change, repeat)
+
+        def put_one():
+            vault_io.put_entry(f"site{rng.randrange(size):06d}.example", synthetic_record(rng))
+        results[f"io.put_entry[{size}]"] = _median_time(put_one, repeat)
+        results[f"io.compact_vault[{size}]"] = _median_time(vault_io.compact_vault, repeat)
+
+    results[f"io.peak_rss_kib[{size}]"] = _peak_rss_kib()
+    queue.put(results)
+
+def _sqlite_case(queue, size: int, repeat: int) -> None:
+    from core import vault_io
+    from core.sqlite_store import migrate_json_to_sqlite
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = os.path.join(tmp, "vault.json")
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(synthetic_vault(size), f, indent=2)
+        vault_io.VAULT_FILE = os.path.join(tmp, "vault.db")
+        results[f"io.sqlite.migrate[{size}]"] = _median_time(
+            lambda: (_remove_db(vault_io.VAULT_FILE), migrate_json_to_sqlite(json_path, vault_io.VAULT_FILE)), 1)
+        results[f"io.sqlite.load_vault[{size}]"] = _median_time(vault_io.load_vault, repeat)
+
+        rng = random.Random(SEED + 1)
+        def get_one():
+            vault_io.get_entry(f"site{rng.randrange(size):06d}.example")
+        results[f"io.sqlite.get_entry[{size}]"] = _median_time(get_one, repeat)
+
+        def put_one():
+            vault_io.put_entry(f"site{rng.randrange(size):06d}.example", synthetic_record(rng))
+        results[f"io.sqlite.put_entry[{size}]"] = _median_time(put_one, repeat)
+        results[f"io.sqlite.accounts[{size}]"] = _median_time(
+            lambda: vault_io.entry_accounts(f"site{rng.randrange(size):06d}.example"), repeat)
+        vault_io.backend().close()
+    queue.put(results)
+
+def _remove_db(path: str) -> None:
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+def bench_io(sizes, repeat: int) -> dict:
+    results = {}
+    for size in sizes:
+        _merge(results, _run_isolated(_io_case, size, repeat))
+        _merge(results, _run_isolated(_sqlite_case, size, repeat))
+    return results
+
+
+# === GUI ===
+
+def _gui_case(queue, size: int) -> None:
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    with tempfile.TemporaryDirectory() as tmp:
+        # Read by core.vault_io on import, so set before the GUI loads it
+        os.environ["VAULTSAFE_VAULT"] = os.path.join(tmp, "vault.json")
+        with open(os.environ["VAULTSAFE_VAULT"], "w", encoding="utf-8") as f:
+            json.dump(synthetic_vault(size), f, indent=2)
+        try:
+            start = time.perf_counter()
+            from PyQt6.QtWidgets import QApplication
+            from gui.main_window import MainWindow
+            imported = time.perf_counter()
+            app = QApplication([])
+            window = MainWindow()
+            constructed = time.perf_counter()
+            window.show()
+            app.processEvents()
+            shown = time.perf_counter()
+        except ImportError as e:
+            queue.put({"_skipped": f"gui: {e}"})
+            return
+
+        # Let the idle pre-warm build the remaining pages, then time switching
+        for _ in range(10):
+            app.processEvents()
+        def switch():
+            window.show_view_entry()
+            window.show_add_entry()
+            app.processEvents()
+        queue.put({
+            f"gui.import[{size}]": imported - start,
+            f"gui.main_window_construct[{size}]": constructed - imported,
+            f"gui.first_show[{size}]": shown - constructed,
+            f"gui.page_switch[{size}]": _median_time(switch, 20) / 2,
+            f"gui.peak_rss_kib[{size}]": _peak_rss_kib(),
+        })
+
+def bench_gui() -> dict:
+    return _run_isolated(_gui_case, GUI_SIZE)
+
+
+# === Runs and comparison ===
+
+def run(only, sizes, repeat: int, samples: int) -> dict:
+    results, skipped, failed = {}, [], []
+    suites = {
+        "crypto": lambda: bench_crypto(repeat, samples),
+        "io": lambda: bench_io(sizes, repeat),
+        "gui": bench_gui,
+    }
+    for name, suite in suites.items():
+        if only and name not in only:
+            continue
+        try:
+            suite_results = suite()
+        except ImportError as e:
+            skipped.append(f"{name}: {e}")
+            continue
+        if "_skipped" in suite_results:
+            skipped.append(suite_results.pop("_skipped"))
+        failed.extend(suite_results.pop("_failed", []))
+        results.update(suite_results)
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "sizes": list(sizes),
+            "repeat": repeat,
+            "samples": samples,
+            "seed": SEED,
+        },
+        "results": results,
+        "skipped": skipped,
+        "failed": failed,
+    }
+
+def compare(baseline: dict, current: dict, threshold: float) -> list[dict]:
+    rows = []
+    for name, new in current["results"].items():
+        old = baseline["results"].get(name)
+        if old is None or new is None or not old:
+            continue
+        change = (new - old) / old
+        rows.append({"metric": name, "baseline": old, "current": new,
+                     "change": change, "regression": change > threshold})
+    return rows
+
+def _print_comparison(rows: list[dict], threshold: float) -> None:
+    width = max((len(r["metric"]) for r in rows), default=10)
+    for r in rows:
+        flag = "REGRESSION" if r["regression"] else ""
+        print(f"{r['metric']:<{width}}  {r['baseline']:>12.6g}  {r['current']:>12.6g}  {r['change']:>+8.1%}  {flag}")
+    regressions = sum(r["regression"] for r in rows)
+    print(f"\n{regressions} regression(s) above {threshold:.0%}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="benchmarks.bench", description="VaultSafe benchmarks")
+    parser.add_argument("--only", nargs="+", choices=("crypto", "io", "gui"))
+    parser.add_argument("--sizes", nargs="+", type=int, default=list(DEFAULT_SIZES))
+    parser.add_argument("--repeat", type=int, default=5, help="runs per metric; the median is kept")
+    parser.add_argument("--samples", type=int, default=10, help="entries per crypto throughput run")
+    parser.add_argument("--out", help="write results JSON here instead of stdout")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"))
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="relative slowdown that counts as a regression (default 0.10)")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        with open(args.compare[0], encoding="utf-8") as f:
+            baseline = json.load(f)
+        with open(args.compare[1], encoding="utf-8") as f:
+            current = json.load(f)
+        rows = compare(baseline, current, args.threshold)
+        _print_comparison(rows, args.threshold)
+        return 1 if any(r["regression"] for r in rows) else 0
+
+    report = run(args.only, args.sizes, args.repeat, args.samples)
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,365 @@
+import os
+import sys
+import json
+import mmap
+import time
+import base64
+import ctypes
+import socket
+import struct
+import subprocess
+
+# ssh-agent style key agent.
+#
+# `python -m vaultsafe agent start` runs a per-user daemon on a Unix socket
+# (0600, inside a 0700 directory). After `agent unlock` it holds format v2
+# vault keys in an mlock'd, non-dumpable mapping and answers decrypt/encrypt
+# (and search token) requests, so a lookup costs a socket round trip instead of a slow KDF. The
+# password itself is dropped right after unlock. Keys are wiped on `lock`,
+# on `stop` and after IDLE_TIMEOUT seconds without requests.
+#
+# The client half only needs json and socket; core.crypto is imported by the
+# daemon and by the local fallback paths, never up front.
+AGENT_SOCK_ENV = "VAULTSAFE_AGENT_SOCK"
+IDLE_TIMEOUT = 300           # seconds without requests before keys are wiped
+MAX_KEYS = 64
+_KEY_SIZE = 32               # crypto.KEY_LENGTH
+_MAX_LINE = 1 << 20
+
+
+class AgentUnavailable(Exception):
+    pass
+
+
+def _private_dir() -> str:
+    # The agent's own directory; the only one it creates or chmods
+    base = os.environ.get("XDG_RUNTIME_DIR") or os.path.join(os.path.expanduser("~"), ".vaultsafe")
+    return os.path.abspath(os.path.join(base, "vaultsafe-agent"))
+
+def socket_path() -> str:
+    override = os.environ.get(AGENT_SOCK_ENV)
+    if override:
+        return os.path.abspath(override)
+    return os.path.join(_private_dir(), "agent.sock")
+
+def _supported() -> bool:
+    return hasattr(socket, "AF_UNIX")
+
+
+# === Locked key storage ===
+
+def _mlock(buf: mmap.mmap) -> bool:
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        addr = ctypes.addressof(ctypes.c_char.from_buffer(buf))
+        return libc.mlock(ctypes.c_void_p(addr), ctypes.c_size_t(len(buf))) == 0
+    except (OSError, AttributeError, TypeError):
+        return False
+
+
+class LockedKeyStore:
+    """Fixed slots of key material in one anonymous mapping.
+
+    The mapping is mlock'd (kept out of swap) and excluded from core dumps
+    where the platform allows; wipe() zeroes it in place.
+    """
+
+    def __init__(self, slots: int = MAX_KEYS):
+        self._map = mmap.mmap(-1, slots * _KEY_SIZE)
+        self.locked = _mlock(self._map)
+        if hasattr(mmap, "MADV_DONTDUMP"):
+            self._map.madvise(mmap.MADV_DONTDUMP)
+        self._slots: dict[str, int] = {}
+        self._capacity = slots
+
+    def put(self, key_id: str, key: bytes) -> None:
+        slot = self._slots.get(key_id)
+        if slot is None:
+            if len(self._slots) >= self._capacity:
+                raise MemoryError("Key agent is full; lock it first.")
+            slot = min(set(range(self._capacity)) - set(self._slots.values()))
+            self._slots[key_id] = slot
+        offset = slot * _KEY_SIZE
+        self._map[offset:offset + _KEY_SIZE] = key
+
+    def get(self, key_id: str) -> bytes | None:
+        slot = self._slots.get(key_id)
+        if slot is None:
+            return None
+        offset = slot * _KEY_SIZE
+        return self._map[offset:offset + _KEY_SIZE]
+
+    def wipe(self) -> None:
+        self._map[:] = bytes(len(self._map))
+        self._slots.clear()
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+
+# === Daemon ===
+
+def _same_user(conn: socket.socket) -> bool:
+    # Linux: check the peer's uid. Elsewhere the socket permissions apply.
+    if not hasattr(socket, "SO_PEERCRED"):
+        return True
+    creds = conn.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+    _, uid, _ = struct.unpack("3i", creds)
+    return uid == os.getuid()
+
+
+def _prepare_socket_dir(path: str) -> None:
+    directory = os.path.dirname(path)
+    if directory == _private_dir():
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        os.chmod(directory, 0o700)
+        return
+    # A directory chosen with --socket or VAULTSAFE_AGENT_SOCK is never
+    # changed; it has to be private already
+    try:
+        st = os.stat(directory)
+    except FileNotFoundError:
+        raise AgentUnavailable(f"Socket directory {directory} does not exist.") from None
+    if st.st_uid != os.getuid() or st.st_mode & 0o022:
+        raise AgentUnavailable(f"{directory} must be owned by you and not group- or "
+                               "world-writable to hold the agent socket.")
+
+
+class AgentServer:
+    def __init__(self, path: str | None = None, idle_timeout: float = IDLE_TIMEOUT):
+        self.path = os.path.abspath(path) if path else socket_path()
+        self.idle_timeout = idle_timeout
+        self.keys = LockedKeyStore()
+        self._running = False
+        self._last_used = time.monotonic()
+
+    def _bind(self) -> socket.socket:
+        _prepare_socket_dir(self.path)
+        if os.path.exists(self.path):
+            if AgentClient(self.path).ping():
+                raise AgentUnavailable(f"An agent is already running at {self.path}.")
+            os.unlink(self.path)  # stale socket from a crashed agent
+
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_umask = os.umask(0o177)
+        try:
+            sock.bind(self.path)
+        finally:
+            os.umask(old_umask)
+        os.chmod(self.path, 0o600)
+        sock.listen(8)
+        sock.settimeout(1.0)
+        return sock
+
+    def serve_forever(self) -> None:
+        sock = self._bind()
+        self._running = True
+        try:
+            while self._running:
+                try:
+                    conn, _ = sock.accept()
+                except socket.timeout:
+                    if time.monotonic() - self._last_used > self.idle_timeout:
+                        break
+                    continue
+                with conn:
+                    self._serve_connection(conn)
+        finally:
+            self.keys.wipe()
+            sock.close()
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+    def _serve_connection(self, conn: socket.socket) -> None:
+        if not _same_user(conn):
+            return
+        conn.settimeout(30)
+        stream = conn.makefile("rwb")
+        try:
+            for line in stream:
+                if len(line) > _MAX_LINE:
+                    break
+                try:
+                    response = self._handle(json.loads(line))
+                except Exception as e:
+                    response = {"ok": False, "error": str(e)}
+                stream.write(json.dumps(response).encode() + b"\n")
+                stream.flush()
+                self._last_used = time.monotonic()
+        except (OSError, ValueError):
+            pass
+        finally:
+            stream.close()
+
+    def _handle(self, request: dict) -> dict:
+        op = request.get("op")
+        if op == "ping":
+            return {"ok": True, "keys": len(self.keys), "mlocked": self.keys.locked}
+
+        if op == "lock":
+            self.keys.wipe()
+            return {"ok": True, "keys": 0}
+
+        if op == "stop":
+            self._running = False
+            return {"ok": True}
+
+        from core import crypto
+
+        if op == "unlock":
+            # Each vault is {"vs", "kdf", "check"}; "check" is one of its
+            # records, opened strictly so a mistyped password is refused here
+            # instead of turning every later answer into the decoy.
+            for vault in request.get("vaults", []):
+                key_id = crypto.vault_key_id(vault)
+                key = crypto.derive_key(request["password"], base64.b64decode(vault["vs"]), vault.get("kdf"))
+                check = vault.get("check")
+                if check is not None:
+                    try:
+                        crypto.decrypt_entry_v2_strict(key, check["salt"], check["iv"], check["ciphertext"])
+                    except crypto.DecryptionError:
+                        return {"ok": False, "error": "Master password does not open this vault."}
+                self.keys.put(key_id, key)
+            return {"ok": True, "keys": len(self.keys)}
+
+        if op == "decrypt":
+            record = request["record"]
+            key = self.keys.get(crypto.vault_key_id(record)) if crypto.is_v2_record(record) else None
+            if key is None:
+                return {"ok": False, "error": "no key for this entry"}
+            try:
+                data = crypto.decrypt_entry_v2_strict(key, record["salt"], record["iv"], record["ciphertext"])
+            except crypto.DecryptionError:
+                # Same decoy as in-process decryption: the agent is no oracle
+                data = {"username": "???", "password": "???"}
+            return {"ok": True, "data": data}
+
+        if op == "encrypt":
+            settings = {"vs": request["vs"], "kdf": request.get("kdf")}
+            key = self.keys.get(crypto.vault_key_id(settings))
+            if key is None:
+                return {"ok": False, "error": "no key for this vault"}
+            record = crypto.encrypt_record("", request["data"], base64.b64decode(request["vs"]), key,
+                                           request.get("kdf"), bool(request.get("compress")),
+                                           bool(request.get("index")))
+            return {"ok": True, "record": record}
+
+        if op == "tokens":
+            # Blind index tokens for search terms; the index key never leaves
+            key = self.keys.get(crypto.vault_key_id({"vs": request["vs"], "kdf": request.get("kdf")}))
+            if key is None:
+                return {"ok": False, "error": "no key for this vault"}
+            from core.blind_index import normalize, term_token
+            index_key = crypto.index_key(key)
+            return {"ok": True, "tokens": [term_token(index_key, normalize(term)) for term in request["terms"]]}
+
+        return {"ok": False, "error": f"unknown op '{op}'"}
+
+
+def spawn_agent(idle_timeout: float = IDLE_TIMEOUT, path: str | None = None, wait: float = 5.0) -> str:
+    # Starts the daemon detached from this process and waits for its socket
+    path = os.path.abspath(path) if path else socket_path()
+    _prepare_socket_dir(path)  # report a bad directory here, not from the detached daemon
+    subprocess.Popen(
+        [sys.executable, "-m", "vaultsafe", "agent", "serve",
+         "--idle-timeout", str(idle_timeout), "--socket", path],
+        stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        start_new_session=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    deadline = time.monotonic() + wait
+    client = AgentClient(path)
+    while time.monotonic() < deadline:
+        if client.ping():
+            return path
+        time.sleep(0.05)
+    raise AgentUnavailable("Key agent did not start.")
+
+
+# === Client ===
+
+class AgentClient:
+    def __init__(self, path: str | None = None, timeout: float = 60.0):
+        self.path = os.path.abspath(path) if path else socket_path()
+        self.timeout = timeout
+
+    def request(self, payload: dict) -> dict:
+        if not _supported() or not os.path.exists(self.path):
+            raise AgentUnavailable("Key agent is not running.")
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(self.timeout)
+                sock.connect(self.path)
+                sock.sendall(json.dumps(payload).encode() + b"\n")
+                with sock.makefile("rb") as stream:
+                    line = stream.readline(_MAX_LINE)
+        except OSError as e:
+            raise AgentUnavailable(f"Key agent is not reachable: {e}") from None
+        if not line:
+            raise AgentUnavailable("Key agent closed the connection.")
+        return json.loads(line)
+
+    def ping(self) -> dict | None:
+        try:
+            return self.request({"op": "ping"})
+        except AgentUnavailable:
+            return None
+
+
+def agent_decrypt(record: dict) -> dict | None:
+    # None when the agent is absent or holds no key for this record
+    try:
+        response = AgentClient().request({"op": "decrypt", "record": record})
+    except AgentUnavailable:
+        return None
+    return response["data"] if response.get("ok") else None
+
+def agent_encrypt(data: dict, vault_salt: bytes | None, kdf: dict | None = None,
+                  compress: bool = False, blind_index: bool = False) -> dict | None:
+    if vault_salt is None:
+        return None  # format v1 entries always need the password
+    request = {"op": "encrypt", "data": data, "vs": base64.b64encode(vault_salt).decode(), "kdf": kdf,
+               "compress": compress, "index": blind_index}
+    try:
+        response = AgentClient().request(request)
+    except AgentUnavailable:
+        return None
+    return response["record"] if response.get("ok") else None
+
+def agent_tokens(vault: dict, terms: list[str]) -> list[str] | None:
+    # Blind index tokens under the key of vault ({"vs", "kdf"}, or any v2
+    # record); None when the agent is absent or holds no such key
+    try:
+        response = AgentClient().request({"op": "tokens", "vs": vault["vs"], "kdf": vault.get("kdf"),
+                                          "terms": terms})
+    except AgentUnavailable:
+        return None
+    return response["tokens"] if response.get("ok") else None
+
+def agent_available() -> bool:
+    response = AgentClient(timeout=1.0).ping()
+    return bool(response and response.get("keys"))
+
+
+# === Agent first, in-process crypto as fallback ===
+
+def decrypt_with_agent(master_password: str, record: dict) -> dict:
+    # A typed master password is always honoured in-process (zero-trust:
+    # whatever the user typed is the truth). With none, ask the agent.
+    if not master_password:
+        data = agent_decrypt(record)
+        if data is None:
+            raise AgentUnavailable("The key agent cannot open this entry; enter the master password.")
+        return data
+    from core.crypto import decrypt_record
+    return decrypt_record(master_password, record)
+
+def encrypt_with_agent(master_password: str, data: dict, vault_salt: bytes | None = None,
+                       kdf: dict | None = None, compress: bool = False, blind_index: bool = False) -> dict:
+    if not master_password:
+        record = agent_encrypt(data, vault_salt, kdf, compress, blind_index)
+        if record is None:
+            raise AgentUnavailable("The key agent cannot encrypt for this vault; enter the master password.")
+        return record
+    from core.crypto import encrypt_record
+    return encrypt_record(master_password, data, vault_salt, kdf=kdf, compress=compress, blind_index=blind_index)
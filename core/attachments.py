@@ -0,0 +1,277 @@
+import os
+import time
+import base64
+import struct
+from typing import BinaryIO
+
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.exceptions import InvalidTag
+
+from core.crypto import DecryptionError, decrypt_record_strict, encrypt_record
+from core.instrument import span
+from core.records import CRYPTO_FIELDS
+from core import vault_io
+
+# File attachments, kept out of the vault in sidecar blobs
+# (VAULT_FILE + ".blobs/<id>"), so opening the vault never reads them.
+#
+# Each blob has its own random key, stored with the attachment's name and
+# size inside the owning entry's encrypted data:
+#   data["attachments"] = [{"id", "name", "size", "key"}, ...]
+# so rekeying re-wraps attachment keys for free and blobs are never rewritten.
+# The record also lists the blob ids in the clear ("attachments": [id, ...])
+# so orphaned blobs can be pruned without any password.
+#
+# Blob layout: header <4sBI8s> (magic, version, chunk size, nonce prefix),
+# then fixed-size AES-GCM chunks of chunk_size plaintext + 16-byte tag (the
+# last one shorter). Chunk i uses nonce prefix || i and AAD
+# header || i || final-flag, so chunks cannot be reordered, dropped or
+# truncated at a boundary without failing authentication, and any chunk can
+# be decrypted on its own for random access.
+MAGIC = b"VSAT"
+VERSION = 1
+CHUNK_SIZE = 64 * 1024
+TAG_LENGTH = 16
+PRUNE_GRACE = 3600           # seconds a blob is left alone after it was written
+_HEADER = struct.Struct("<4sBI8s")
+
+
+class AttachmentError(Exception):
+    pass
+
+
+def blob_dir() -> str:
+    return vault_io.VAULT_FILE + ".blobs"
+
+def _blob_path(blob_id: str) -> str:
+    if not blob_id or not all(c in "0123456789abcdef" for c in blob_id):
+        raise AttachmentError("Invalid attachment id.")
+    return os.path.join(blob_dir(), blob_id)
+
+def _chunk_aad(header: bytes, index: int, final: bool) -> bytes:
+    return header + struct.pack("<QB", index, final)
+
+def _chunk_nonce(prefix: bytes, index: int) -> bytes:
+    return prefix + struct.pack(">I", index)
+
+
+# === Streaming encryption ===
+
+def encrypt_stream(src: BinaryIO, dst: BinaryIO, key: bytes, chunk_size: int = CHUNK_SIZE) -> int:
+    """Encrypt src into dst one chunk at a time; returns the plaintext size."""
+    header = _HEADER.pack(MAGIC, VERSION, chunk_size, os.urandom(8))
+    prefix = header[-8:]
+    aesgcm = AESGCM(key)
+    dst.write(header)
+
+    total, index = 0, 0
+    chunk = src.read(chunk_size)
+    while True:
+        # One chunk of read-ahead tells us which chunk is final
+        following = src.read(chunk_size) if len(chunk) == chunk_size else b""
+        final = not following
+        dst.write(aesgcm.encrypt(_chunk_nonce(prefix, index), chunk, _chunk_aad(header, index, final)))
+        total += len(chunk)
+        if final:
+            return total
+        chunk, index = following, index + 1
+
+
+class AttachmentReader:
+    """Random-access reader over one encrypted blob."""
+
+    def __init__(self, path: str, key: bytes):
+        self._f = open(path, "rb")
+        try:
+            self._header = self._f.read(_HEADER.size)
+            if len(self._header) != _HEADER.size:
+                raise AttachmentError("Attachment is truncated.")
+            magic, version, self.chunk_size, self._prefix = _HEADER.unpack(self._header)
+            if magic != MAGIC or version != VERSION or not self.chunk_size:
+                raise AttachmentError("Not a VaultSafe attachment.")
+            body = os.fstat(self._f.fileno()).st_size - _HEADER.size
+            stride = self.chunk_size + TAG_LENGTH
+            self.chunk_count = max(1, -(-body // stride))
+            last = body - (self.chunk_count - 1) * stride - TAG_LENGTH
+            if body < TAG_LENGTH or last < 0:
+                raise AttachmentError("Attachment is truncated.")
+            self.size = (self.chunk_count - 1) * self.chunk_size + last
+        except BaseException:
+            self._f.close()
+            raise
+        self._aesgcm = AESGCM(key)
+
+    def read_chunk(self, index: int) -> bytes:
+        if not 0 <= index < self.chunk_count:
+            raise IndexError(index)
+        stride = self.chunk_size + TAG_LENGTH
+        self._f.seek(_HEADER.size + index * stride)
+        sealed = self._f.read(stride)
+        final = index == self.chunk_count - 1
+        try:
+            return self._aesgcm.decrypt(_chunk_nonce(self._prefix, index), sealed,
+                                        _chunk_aad(self._header, index, final))
+        except InvalidTag:
+            raise DecryptionError(f"Attachment chunk {index} failed authentication.") from None
+
+    def read(self, offset: int, length: int) -> bytes:
+        # Decrypts only the chunks covering [offset, offset + length)
+        end = min(offset + length, self.size)
+        if offset >= end:
+            return b""
+        first, last = offset // self.chunk_size, (end - 1) // self.chunk_size
+        data = b"".join(self.read_chunk(i) for i in range(first, last + 1))
+        start = offset - first * self.chunk_size
+        return data[start:start + end - offset]
+
+    def __iter__(self):
+        for index in range(self.chunk_count):
+            yield self.read_chunk(index)
+
+    def close(self) -> None:
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+# === Entry-level operations ===
+
+def _open_entry(master_password: str, site: str) -> tuple[dict, dict]:
+    record = vault_io.get_entry(site)
+    if record is None:
+        raise AttachmentError(f"No entry for '{site}'.")
+    try:
+        # Strict: re-saving the decoy would destroy the entry
+        return record, decrypt_record_strict(master_password, record)
+    except DecryptionError:
+        raise AttachmentError("Master password does not open this entry.") from None
+
+def _save_entry(master_password: str, site: str, record: dict, data: dict) -> None:
+    from core import history
+    history.save_record(site, record)
+    kept = {field: value for field, value in record.items() if field not in CRYPTO_FIELDS}
+    new_record = {**kept, **encrypt_record(master_password, data, **vault_io.entry_settings())}
+    # Conditional on the rev read in _open_entry, so a concurrent edit of
+    # the entry is reported instead of overwritten
+    vault_io.put_entry(site, link_attachments(new_record, data), vault_io.record_rev(record))
+
+def link_attachments(record: dict, data: dict) -> dict:
+    # Mirror the blob ids from the encrypted data into the record, in the clear
+    ids = [ref["id"] for ref in data.get("attachments", ())]
+    if ids:
+        record["attachments"] = ids
+    else:
+        record.pop("attachments", None)
+    return record
+
+def _find(data: dict, attachment_id: str) -> dict:
+    for ref in data.get("attachments", ()):
+        if ref["id"] == attachment_id:
+            return ref
+    raise AttachmentError(f"No attachment '{attachment_id}' on this entry.")
+
+def _public(ref: dict) -> dict:
+    return {"id": ref["id"], "name": ref["name"], "size": ref["size"]}
+
+def add_attachment(master_password: str, site: str, src: BinaryIO, name: str) -> dict:
+    """Encrypt src into a new blob and reference it from the entry.
+
+    The blob is written (and fsynced) before the entry, so a crash leaves
+    at most an orphan for prune_blobs(), never a dangling reference.
+    """
+    with span("attachments.add"):
+        record, data = _open_entry(master_password, site)
+        blob_id = os.urandom(16).hex()
+        key = os.urandom(32)
+        os.makedirs(blob_dir(), exist_ok=True)
+        path = _blob_path(blob_id)
+        tmp_path = path + ".tmp"
+        try:
+            with open(tmp_path, "wb") as dst:
+                size = encrypt_stream(src, dst, key)
+                dst.flush()
+                os.fsync(dst.fileno())
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        ref = {"id": blob_id, "name": name, "size": size, "key": base64.b64encode(key).decode()}
+        data["attachments"] = [*data.get("attachments", ()), ref]
+        _save_entry(master_password, site, record, data)
+        return _public(ref)
+
+def list_attachments(master_password: str, site: str) -> list[dict]:
+    _, data = _open_entry(master_password, site)
+    return [_public(ref) for ref in data.get("attachments", ())]
+
+def open_attachment(master_password: str, site: str, attachment_id: str) -> AttachmentReader:
+    _, data = _open_entry(master_password, site)
+    ref = _find(data, attachment_id)
+    return AttachmentReader(_blob_path(ref["id"]), base64.b64decode(ref["key"]))
+
+def extract_attachment(master_password: str, site: str, attachment_id: str, dst: BinaryIO) -> int:
+    # Streams to dst chunk by chunk; returns the number of bytes written
+    with span("attachments.extract"), open_attachment(master_password, site, attachment_id) as reader:
+        written = 0
+        for chunk in reader:
+            dst.write(chunk)
+            written += len(chunk)
+        return written
+
+def remove_attachment(master_password: str, site: str, attachment_id: str) -> None:
+    record, data = _open_entry(master_password, site)
+    ref = _find(data, attachment_id)
+    data["attachments"] = [other for other in data["attachments"] if other is not ref]
+    if not data["attachments"]:
+        del data["attachments"]
+    _save_entry(master_password, site, record, data)
+    from core import history
+    if attachment_id in history.referenced_blobs(site):
+        return  # an earlier revision still needs it; prune_blobs() once that expires
+    try:
+        os.remove(_blob_path(attachment_id))
+    except FileNotFoundError:
+        pass
+
+def _blob_id(name: str) -> bool:
+    # Finished blobs only; "<id>.tmp" is an add_attachment still writing
+    return len(name) == 32 and all(c in "0123456789abcdef" for c in name)
+
+def prune_blobs(grace: float = PRUNE_GRACE) -> int:
+    """Delete blobs no entry or history revision references (left by
+    replaced or deleted entries and expired revisions).
+
+    add_attachment renames its blob into place before saving the entry
+    that references it, without holding any lock across the two; blobs
+    written less than grace seconds ago are skipped so that gap is safe.
+    """
+    from core import history
+    try:
+        names = [name for name in os.listdir(blob_dir()) if _blob_id(name)]
+    except FileNotFoundError:
+        return 0
+    # Listed before the references are read: a blob created after the
+    # listing is not a candidate at all
+    referenced = {blob_id for record in vault_io.load_vault().values()
+                  for blob_id in record.get("attachments", ())}
+    referenced |= history.referenced_blobs()
+    cutoff = time.time() - grace
+    removed = 0
+    for name in names:
+        if name in referenced:
+            continue
+        path = os.path.join(blob_dir(), name)
+        try:
+            if os.stat(path).st_mtime > cutoff:
+                continue
+            os.remove(path)
+        except FileNotFoundError:
+            continue
+        removed += 1
+    return removed
@@ -0,0 +1,150 @@
+import os
+import hmac
+import math
+import hashlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
+from typing import Callable
+
+from core.crypto import DecryptionError, decrypt_record_strict, is_v2_record
+from core import records
+from core.instrument import span
+from core.vault_io import load_vault
+
+# Vault health audit: entries that do not open with the master password
+# (they would reveal the "???" decoy), reused passwords and weak ones.
+#
+# Passwords never leave the worker that decrypted them. Each worker returns
+# only an HMAC of the password under a key made fresh for this audit, plus a
+# strength score; reuse is found by grouping equal HMACs. The HMAC key lives
+# in memory for one audit and is never stored, so the digests cannot be
+# compared across runs or brute-forced offline.
+WEAK_SCORE = 2               # scores 0-2 are reported as weak
+
+# A few of the most common leaked passwords; anything matching scores 0
+_COMMON = frozenset((
+    "123456", "123456789", "12345678", "12345", "1234567", "1234567890",
+    "password", "password1", "qwerty", "qwerty123", "abc123", "111111",
+    "123123", "000000", "iloveyou", "admin", "welcome", "letmein",
+    "monkey", "dragon", "football", "baseball", "sunshine", "princess",
+))
+_SEQUENCES = ("abcdefghijklmnopqrstuvwxyz", "0123456789", "qwertyuiop", "asdfghjkl", "zxcvbnm")
+
+
+class AuditCancelled(Exception):
+    pass
+
+
+def strength_score(password: str) -> int:
+    """0 (trivial) to 4 (strong), from an entropy estimate.
+
+    Charset size times length, discounted for repeated characters and
+    keyboard/alphabet runs. A rough guide, not a cracking-time model.
+    """
+    if not password or password.lower() in _COMMON:
+        return 0
+    pool = 0
+    if any(c.islower() for c in password):
+        pool += 26
+    if any(c.isupper() for c in password):
+        pool += 26
+    if any(c.isdigit() for c in password):
+        pool += 10
+    if any(not c.isalnum() for c in password):
+        pool += 33
+    # Characters that extend a run or repeat the previous one add little
+    lowered = password.lower()
+    effective = 1.0
+    for prev, cur in zip(lowered, lowered[1:]):
+        if cur == prev or any(prev + cur in seq or cur + prev in seq for seq in _SEQUENCES):
+            effective += 0.25
+        else:
+            effective += 1
+    bits = effective * math.log2(max(pool, 2))
+    if bits < 28:
+        return 0
+    if bits < 36:
+        return 1
+    if bits < 60:
+        return 2
+    if bits < 100:
+        return 3
+    return 4
+
+
+def _check_record(master_password: str, vault_keys: dict[str, bytes], hash_key: bytes, record: dict) -> dict:
+    # Runs in a worker process; returns no plaintext
+    try:
+        data = decrypt_record_strict(master_password, record, vault_keys)
+    except DecryptionError:
+        return {"ok": False}
+    password = data.get("password") or ""
+    return {
+        "ok": True,
+        "digest": hmac.new(hash_key, password.encode(), hashlib.sha256).hexdigest(),
+        "score": strength_score(password),
+    }
+
+
+def audit_vault(master_password: str,
+                on_progress: Callable[[int, int], None] | None = None,
+                cancelled: Callable[[], bool] | None = None,
+                max_workers: int | None = None) -> dict:
+    """Decrypt every entry in parallel and report on vault health.
+
+    Returns {"total", "failing": [site], "reused": [[site, ...], ...],
+    "weak": [{"site", "score"}], "scores": {score: count}}. cancelled is
+    polled as results arrive; when it returns True, pending work is dropped
+    and AuditCancelled is raised.
+    """
+    with span("audit.vault") as sp:
+        vault = load_vault()
+        sp.entries = len(vault)
+        hash_key = os.urandom(32)
+        check = partial(_check_record, master_password, records.vault_keys(master_password, vault), hash_key)
+
+        results = {}
+        total = len(vault)
+        if all(map(is_v2_record, vault.values())):
+            # One KDF already paid for; the rest is HKDF + AES per entry
+            for done, (site, record) in enumerate(vault.items(), 1):
+                if cancelled and cancelled():
+                    raise AuditCancelled()
+                results[site] = check(record)
+                if on_progress:
+                    on_progress(done, total)
+        else:
+            workers = max_workers or min(total, os.cpu_count() or 1)
+            # spawn, not fork: the GUI runs this from a worker thread, and a
+            # forked child would inherit Qt state and locks held elsewhere
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                futures = {pool.submit(check, record): site for site, record in vault.items()}
+                try:
+                    for done, future in enumerate(as_completed(futures), 1):
+                        if cancelled and cancelled():
+                            raise AuditCancelled()
+                        results[futures[future]] = future.result()
+                        if on_progress:
+                            on_progress(done, total)
+                except BaseException:
+                    pool.shutdown(cancel_futures=True)
+                    raise
+
+    groups: dict[str, list[str]] = {}
+    scores = {score: 0 for score in range(5)}
+    weak = []
+    failing = []
+    for site in sorted(results, key=str.casefold):
+        result = results[site]
+        if not result["ok"]:
+            failing.append(site)
+            continue
+        groups.setdefault(result["digest"], []).append(site)
+        scores[result["score"]] += 1
+        if result["score"] <= WEAK_SCORE:
+            weak.append({"site": site, "score": result["score"]})
+
+    reused = sorted((sites for sites in groups.values() if len(sites) > 1), key=len, reverse=True)
+    return {"total": total, "failing": failing, "reused": reused, "weak": weak, "scores": scores}
@@ -0,0 +1,47 @@
+import hmac
+import base64
+import hashlib
+import unicodedata
+
+from core.secret import SecretBuffer
+
+# Blind index: keyed search tokens for an entry's username and tags, kept
+# unencrypted beside the record as "bi", so a search finds its candidate
+# entries by token and decrypts only those.
+#
+# Terms are normalized (NFKC, trimmed, case-folded); an email username also
+# yields "@domain", so one search finds every login at a work address. A
+# token is HMAC-SHA256 of a term under the index key, an HKDF subkey of the
+# format v2 vault key (crypto.INDEX_KEY_INFO), cut to TOKEN_BYTES. Without
+# the master password tokens are random strings. They do show which entries
+# share a username or tag, and how many terms an entry has; the list is
+# sorted so it does not tell usernames from tags.
+TOKEN_BYTES = 12
+
+
+def normalize(term: str) -> str:
+    return unicodedata.normalize("NFKC", term).strip().casefold()
+
+def entry_terms(data: dict) -> set[str]:
+    terms = set()
+    username = data.get("username")
+    if isinstance(username, SecretBuffer):
+        username = username.reveal()
+    if isinstance(username, str):
+        username = normalize(username)
+        if username:
+            terms.add(username)
+        if "@" in username.strip("@"):
+            terms.add("@" + username.rsplit("@", 1)[1])
+    for tag in data.get("tags", ()):
+        if isinstance(tag, str) and normalize(tag):
+            terms.add(normalize(tag))
+    return terms
+
+def term_token(index_key: bytes, term: str) -> str:
+    # term must already be normalized
+    digest = hmac.new(index_key, term.encode(), hashlib.sha256).digest()
+    return base64.b64encode(digest[:TOKEN_BYTES]).decode()
+
+def entry_tokens(index_key: bytes, data: dict) -> list[str]:
+    return sorted(term_token(index_key, term) for term in entry_terms(data))
@@ -1,33 +1,242 @@
 import os
-import json
+import hmac
+import time
 import base64
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+import hashlib
+import threading
+from collections import OrderedDict
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 
+from core.blind_index import entry_tokens
+from core.instrument import span
+from core.kdf import PBKDF2, make_kdf, params_id
+from core.secret import Secret, decode_plaintext, encode_plaintext, secret_bytes
+
 # Constants
-PBKDF2_ITERATIONS = 200_000  # increase for slower brute-force
+PBKDF2_ITERATIONS = 200_000  # KDF cost of records that predate per-record "kdf"
 KEY_LENGTH = 32              # 256-bit AES
 SALT_LENGTH = 16
 IV_LENGTH = 12               # Recommended for AES-GCM
 
-def derive_key(password: str, salt: bytes) -> bytes:
-    kdf = PBKDF2HMAC(
+LEGACY_KDF = {"alg": PBKDF2, "iterations": PBKDF2_ITERATIONS}
+
+# Format v2: one slow KDF run per vault salt, HKDF-SHA512 subkey per entry
+RECORD_V2 = 2
+ENTRY_KEY_INFO = b"VaultSafe v2 entry key"
+INDEX_KEY_INFO = b"VaultSafe v2 blind index"
+
+# Key cache defaults
+KEY_CACHE_SIZE = 64          # max derived keys held at once
+KEY_CACHE_IDLE_TTL = 120     # seconds since last use
+KEY_CACHE_MAX_TTL = 900      # seconds since derivation, regardless of use
+
+
+class KeyCache:
+    """Opt-in LRU cache of derived keys, keyed by (password fingerprint, salt,
+    KDF parameters).
+
+    The password itself is never stored: it is reduced to an HMAC under a
+    random per-process pepper, and the pepper is replaced on every wipe so
+    old fingerprints become meaningless.
+    """
+
+    def __init__(self, max_entries: int = KEY_CACHE_SIZE,
+                 idle_ttl: float = KEY_CACHE_IDLE_TTL,
+                 max_ttl: float = KEY_CACHE_MAX_TTL):
+        self.max_entries = max_entries
+        self.idle_ttl = idle_ttl
+        self.max_ttl = max_ttl
+        self._lock = threading.Lock()
+        self._pepper = os.urandom(32)
+        # (fingerprint, salt, kdf id) -> [key, created_at, last_used_at]
+        self._entries: OrderedDict[tuple[bytes, bytes, str], list] = OrderedDict()
+
+    def _fingerprint(self, password: Secret) -> bytes:
+        return hmac.new(self._pepper, secret_bytes(password), hashlib.sha256).digest()
+
+    def _is_expired(self, entry: list, now: float) -> bool:
+        _, created, last_used = entry
+        return now - last_used > self.idle_ttl or now - created > self.max_ttl
+
+    def _drop(self, cache_key: tuple[bytes, bytes, str]) -> None:
+        key = self._entries.pop(cache_key)[0]
+        key[:] = bytes(len(key))
+
+    def get(self, password: Secret, salt: bytes, kdf_id: str = "") -> bytes | None:
+        with self._lock:
+            cache_key = (self._fingerprint(password), salt, kdf_id)
+            entry = self._entries.get(cache_key)
+            if entry is None:
+                return None
+            now = time.monotonic()
+            if self._is_expired(entry, now):
+                self._drop(cache_key)
+                return None
+            entry[2] = now
+            self._entries.move_to_end(cache_key)
+            return bytes(entry[0])
+
+    def put(self, password: Secret, salt: bytes, key: bytes, kdf_id: str = "") -> None:
+        with self._lock:
+            cache_key = (self._fingerprint(password), salt, kdf_id)
+            if cache_key in self._entries:
+                self._drop(cache_key)
+            now = time.monotonic()
+            self._entries[cache_key] = [bytearray(key), now, now]
+            self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        for cache_key in [k for k, e in self._entries.items() if self._is_expired(e, now)]:
+            self._drop(cache_key)
+        while len(self._entries) > self.max_entries:
+            self._drop(next(iter(self._entries)))
+
+    def wipe(self) -> None:
+        with self._lock:
+            for cache_key in list(self._entries):
+                self._drop(cache_key)
+            self._pepper = os.urandom(32)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_key_cache: KeyCache | None = None
+
+def enable_key_cache(max_entries: int = KEY_CACHE_SIZE,
+                     idle_ttl: float = KEY_CACHE_IDLE_TTL,
+                     max_ttl: float = KEY_CACHE_MAX_TTL) -> KeyCache:
+    global _key_cache
+    if _key_cache is not None:
+        _key_cache.wipe()
+    _key_cache = KeyCache(max_entries, idle_ttl, max_ttl)
+    return _key_cache
+
+def disable_key_cache() -> None:
+    global _key_cache
+    if _key_cache is not None:
+        _key_cache.wipe()
+    _key_cache = None
+
+def wipe_key_cache() -> None:
+    # Call on lock / quit: zeroes every cached key
+    if _key_cache is not None:
+        _key_cache.wipe()
+
+def derive_key(password: Secret, salt: bytes, kdf: dict | None = None) -> bytes:
+    # kdf: the record's stored parameters; None means LEGACY_KDF
+    params = kdf or LEGACY_KDF
+    kdf_id = params_id(params)
+    cache = _key_cache
+    if cache is not None:
+        key = cache.get(password, salt, kdf_id)
+        if key is not None:
+            return key
+
+    stretcher = make_kdf(params, salt, KEY_LENGTH)
+    with span("kdf.derive_key") as sp:
+        sp.entries = 1
+        key = stretcher.derive(secret_bytes(password))
+    if cache is not None:
+        cache.put(password, salt, key, kdf_id)
+    return key
+
+def encrypt_entry(master_password: Secret, data: dict, kdf: dict | None = None,
+                  compress: bool = False) -> tuple[str, str, str]:
+    salt = os.urandom(SALT_LENGTH)
+    iv = os.urandom(IV_LENGTH)
+    key = derive_key(master_password, salt, kdf)
+
+    aesgcm = AESGCM(key)
+    with encode_plaintext(data, compress) as plaintext, span("crypto.encrypt") as sp:
+        sp.entries = 1
+        ciphertext = aesgcm.encrypt(iv, plaintext.view(), None)
+
+    return (
+        base64.b64encode(salt).decode(),
+        base64.b64encode(iv).decode(),
+        base64.b64encode(ciphertext).decode()
+    )
+
+class DecryptionError(Exception):
+    pass
+
+def _open(key: bytes, iv: bytes, ciphertext: bytes, secret: bool = False) -> dict:
+    # secret=True returns string fields as SecretBuffers (see core.secret).
+    # AES-GCM itself still hands back one immutable plaintext bytes object.
+    aesgcm = AESGCM(key)
+
+    try:
+        with span("crypto.decrypt") as sp:
+            sp.entries = 1
+            plaintext = aesgcm.decrypt(iv, ciphertext, None)
+        return decode_plaintext(plaintext, secret)
+    except Exception:
+        raise DecryptionError("entry could not be decrypted") from None
+
+def _decrypt_bytes(master_password: Secret, salt: bytes, iv: bytes, ciphertext: bytes,
+                   kdf: dict | None = None, secret: bool = False) -> dict:
+    return _open(derive_key(master_password, salt, kdf), iv, ciphertext, secret)
+
+def decrypt_entry_strict(master_password: Secret, salt_b64: str, iv_b64: str, ciphertext_b64: str,
+                         kdf: dict | None = None, secret: bool = False) -> dict:
+    # Raises instead of returning a decoy. Only for bulk operations that must
+    # not silently overwrite entries (rekey); the GUI keeps decrypt_entry.
+    salt = base64.b64decode(salt_b64)
+    iv = base64.b64decode(iv_b64)
+    ciphertext = base64.b64decode(ciphertext_b64)
+    return _decrypt_bytes(master_password, salt, iv, ciphertext, kdf, secret)
+
+def decrypt_entry(master_password: str, salt_b64: str, iv_b64: str, ciphertext_b64: str,
+                  kdf: dict | None = None) -> dict:
+    try:
+        return decrypt_entry_strict(master_password, salt_b64, iv_b64, ciphertext_b64, kdf)
+    except DecryptionError:
+        # Even if wrong password or tampered data — return random garbage
+        return {"username": "???", "password": "???"}
+
+
+# === Format v2 key hierarchy ===
+#
+# The master password is stretched once against a vault-level salt; each
+# entry key is an HKDF-SHA512 subkey of that vault key, salted with the
+# entry's own salt. Like v1, nothing stored can confirm a password guess.
+# v2 records carry their vault salt ("vs") so they stay self-describing.
+
+def derive_entry_key(vault_key: bytes, entry_salt: bytes) -> bytes:
+    hkdf = HKDF(
+        algorithm=hashes.SHA512(),
+        length=KEY_LENGTH,
+        salt=entry_salt,
+        info=ENTRY_KEY_INFO
+    )
+    return hkdf.derive(vault_key)
+
+def derive_subkey(vault_key: bytes, info: bytes) -> bytes:
+    # Independent key for a purpose other than entry encryption (keyed
+    # digests, search tokens); info names the purpose
+    hkdf = HKDF(
         algorithm=hashes.SHA512(),
         length=KEY_LENGTH,
-        salt=salt,
-        iterations=PBKDF2_ITERATIONS
+        salt=None,
+        info=info
     )
-    return kdf.derive(password.encode())
+    return hkdf.derive(vault_key)
 
-def encrypt_entry(master_password: str, data: dict) -> tuple[str, str, str]:
+def index_key(vault_key: bytes) -> bytes:
+    return derive_subkey(vault_key, INDEX_KEY_INFO)
+
+def encrypt_entry_v2(vault_key: bytes, data: dict, compress: bool = False) -> tuple[str, str, str]:
     salt = os.urandom(SALT_LENGTH)
     iv = os.urandom(IV_LENGTH)
-    key = derive_key(master_password, salt)
+    key = derive_entry_key(vault_key, salt)
 
     aesgcm = AESGCM(key)
-    plaintext = json.dumps(data).encode()
-    ciphertext = aesgcm.encrypt(iv, plaintext, None)
+    with encode_plaintext(data, compress) as plaintext, span("crypto.encrypt") as sp:
+        sp.entries = 1
+        ciphertext = aesgcm.encrypt(iv, plaintext.view(), None)
 
     return (
         base64.b64encode(salt).decode(),
@@ -35,17 +244,62 @@ def encrypt_entry(master_password: str, data: dict) -> tuple[str, str, str]:
         base64.b64encode(ciphertext).decode()
     )
 
-def decrypt_entry(master_password: str, salt_b64: str, iv_b64: str, ciphertext_b64: str) -> dict:
+def decrypt_entry_v2_strict(vault_key: bytes, salt_b64: str, iv_b64: str, ciphertext_b64: str,
+                            secret: bool = False) -> dict:
     salt = base64.b64decode(salt_b64)
     iv = base64.b64decode(iv_b64)
     ciphertext = base64.b64decode(ciphertext_b64)
+    return _open(derive_entry_key(vault_key, salt), iv, ciphertext, secret)
 
-    key = derive_key(master_password, salt)
-    aesgcm = AESGCM(key)
+def is_v2_record(record: dict) -> bool:
+    return record.get("v") == RECORD_V2
+
+def vault_key_id(record: dict) -> str:
+    # v2 records sharing this id share one vault key
+    return record["vs"] + "|" + params_id(record.get("kdf") or LEGACY_KDF)
+
+def encrypt_record(master_password: Secret, data: dict, vault_salt: bytes | None = None,
+                   vault_key: bytes | None = None, kdf: dict | None = None,
+                   compress: bool = False, blind_index: bool = False) -> dict:
+    # v1 record when the vault has no vault salt, v2 otherwise. "kdf" is
+    # stored whenever given, so records made under different cost settings
+    # keep decrypting after the setting changes. blind_index adds search
+    # tokens ("bi", see core.blind_index) to v2 records.
+    if vault_salt is None:
+        salt, iv, ciphertext = encrypt_entry(master_password, data, kdf, compress)
+        record = {"salt": salt, "iv": iv, "ciphertext": ciphertext}
+    else:
+        if vault_key is None:
+            vault_key = derive_key(master_password, vault_salt, kdf)
+        salt, iv, ciphertext = encrypt_entry_v2(vault_key, data, compress)
+        record = {
+            "v": RECORD_V2,
+            "vs": base64.b64encode(vault_salt).decode(),
+            "salt": salt,
+            "iv": iv,
+            "ciphertext": ciphertext
+        }
+        if blind_index:
+            record["bi"] = entry_tokens(index_key(vault_key), data)
+    if kdf:
+        record["kdf"] = kdf
+    return record
 
+def decrypt_record_strict(master_password: Secret, record: dict,
+                          vault_keys: dict[str, bytes] | None = None, secret: bool = False) -> dict:
+    # vault_keys: optional {vault_key_id(record): vault key} pre-derived by the caller.
+    # secret=True: string fields come back as SecretBuffers; wipe them after use.
+    kdf = record.get("kdf")
+    if not is_v2_record(record):
+        return decrypt_entry_strict(master_password, record["salt"], record["iv"], record["ciphertext"], kdf, secret)
+    vault_key = (vault_keys or {}).get(vault_key_id(record))
+    if vault_key is None:
+        vault_key = derive_key(master_password, base64.b64decode(record["vs"]), kdf)
+    return decrypt_entry_v2_strict(vault_key, record["salt"], record["iv"], record["ciphertext"], secret)
+
+def decrypt_record(master_password: Secret, record: dict,
+                   vault_keys: dict[str, bytes] | None = None) -> dict:
     try:
-        plaintext = aesgcm.decrypt(iv, ciphertext, None)
-        return json.loads(plaintext.decode())
-    except Exception:
-        # Even if wrong password or tampered data — return random garbage
+        return decrypt_record_strict(master_password, record, vault_keys)
+    except DecryptionError:
         return {"username": "???", "password": "???"}
@@ -0,0 +1,225 @@
+import os
+import hmac
+import json
+import time
+import hashlib
+
+from core import vault_io
+from core.agent import encrypt_with_agent
+from core.crypto import DecryptionError, decrypt_record_strict, derive_key, derive_subkey, encrypt_record
+from core.instrument import span
+from core.secret import encode_plaintext
+
+# Per-entry history: earlier contents of an entry, so a bad update can be
+# undone.
+#
+# Revisions live beside the vault in VAULT_FILE + ".history/", one small
+# JSON-lines file per entry, oldest first, so load_vault never reads them.
+# Each line is {"site", "rev", "time", "digest", "attachments", "record"}:
+# record is an ordinary encrypted record of the entry at that revision. When
+# the plaintext is at hand it is zlib-compressed before encryption (every
+# decrypt path reads that); otherwise the replaced record is kept verbatim.
+# Viewing or restoring a revision decrypts that one record only.
+#
+# digest is an HMAC of site + plaintext under a key derived from the v2
+# vault key, or None (v1 vaults, key agent sessions, verbatim copies). A
+# revision whose digest matches an older one replaces it, so each distinct
+# content of an entry is kept once. The site is mixed in so equal passwords
+# on different entries do not get equal digests.
+#
+# Retention is applied whenever an entry's history is written: at most
+# HISTORY_MAX_REVISIONS per entry, none older than HISTORY_MAX_AGE.
+HISTORY_MAX_REVISIONS = 20
+HISTORY_MAX_AGE = 365 * 24 * 3600      # seconds
+DIGEST_INFO = b"VaultSafe v2 history digest"
+_DECOY = {"username": "???", "password": "???"}  # what a wrong master password decrypts to
+
+
+class HistoryError(Exception):
+    pass
+
+
+def history_dir() -> str:
+    return vault_io.VAULT_FILE + ".history"
+
+def _history_path(site: str) -> str:
+    # Entry names can hold anything; hash them into a file name
+    return os.path.join(history_dir(), hashlib.sha256(site.encode()).hexdigest()[:32] + ".jsonl")
+
+def _parse(raw: bytes) -> list[dict]:
+    return [json.loads(line) for line in raw.splitlines() if line.strip()]
+
+def _read(site: str) -> list[dict]:
+    try:
+        with open(_history_path(site), "rb") as f:
+            revisions = _parse(f.read())
+    except FileNotFoundError:
+        return []
+    return [revision for revision in revisions if revision.get("site") == site]
+
+def _write(path: str, revisions: list[dict]) -> None:
+    if not revisions:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        return
+    os.makedirs(history_dir(), exist_ok=True)
+    raw = b"".join(json.dumps(revision, separators=(",", ":")).encode() + b"\n" for revision in revisions)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(raw)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+class _Locked:
+    # Exclusive lock over the history directory, across processes
+    def __enter__(self):
+        os.makedirs(history_dir(), exist_ok=True)
+        self.f = open(os.path.join(history_dir(), ".lock"), "a+b")
+        vault_io._flock(self.f, exclusive=True)
+        return self
+
+    def __exit__(self, *exc):
+        vault_io._funlock(self.f)
+        self.f.close()
+        return False
+
+def _retain(revisions: list[dict], now: float, max_revisions: int, max_age: float) -> list[dict]:
+    kept = [revision for revision in revisions if now - revision["time"] <= max_age]
+    return kept[-max_revisions:] if max_revisions > 0 else []
+
+def _append(*new: dict) -> None:
+    # One lock for any number of revisions, of any entries
+    with _Locked():
+        for revision in new:
+            site = revision["site"]
+            revisions = _read(site)
+            if revision["digest"]:
+                revisions = [other for other in revisions if other.get("digest") != revision["digest"]]
+            revisions.append(revision)
+            _write(_history_path(site), _retain(revisions, revision["time"], HISTORY_MAX_REVISIONS, HISTORY_MAX_AGE))
+
+def _digest(key: bytes, site: str, data: dict) -> str:
+    # Field order must not matter, so hash a sorted encoding
+    mac = hmac.new(key, site.encode() + b"\x00", hashlib.sha256)
+    with encode_plaintext(dict(sorted(data.items()))) as plaintext:
+        mac.update(plaintext.view())
+    return mac.hexdigest()
+
+def _blob_ids(data: dict) -> list[str]:
+    return [ref["id"] for ref in data.get("attachments", ())]
+
+
+def save_revision(master_password: str, site: str, data: dict, rev: int) -> None:
+    """Keep data, the plaintext of the entry at rev, as a revision.
+
+    Call before replacing the entry. An empty master password encrypts
+    through the key agent (and skips the dedup digest).
+    """
+    with span("history.save"):
+        settings = vault_io.entry_settings()
+        digest = None
+        if master_password:
+            vault_key = None
+            if settings["vault_salt"] is not None:
+                vault_key = derive_key(master_password, settings["vault_salt"], settings["kdf"])
+                digest = _digest(derive_subkey(vault_key, DIGEST_INFO), site, data)
+            record = encrypt_record(master_password, data, settings["vault_salt"], vault_key,
+                                    settings["kdf"], compress=True, blind_index=settings["blind_index"])
+        else:
+            record = encrypt_with_agent("", data, compress=True, **settings)
+        _append({"site": site, "rev": rev, "time": int(time.time()), "digest": digest,
+                 "attachments": _blob_ids(data), "record": record})
+
+def save_replaced(master_password: str, site: str, old_data: dict | None, data: dict, rev: int) -> None:
+    """Keep what an update of site from old_data (as revealed at rev) to
+    data is about to replace.
+
+    Without trustworthy plaintext (None, or the decoy a wrong master
+    password reveals) the stored record is kept verbatim, since the update
+    is about to overwrite it under that password.
+    """
+    if old_data is None or old_data == _DECOY:
+        current = vault_io.get_entry(site)
+        if current is not None:
+            save_record(site, current)
+    elif old_data != data:
+        save_revision(master_password, site, old_data, rev)
+
+def save_record(site: str, record: dict) -> None:
+    # Keep an encrypted record as it is; for when the plaintext is not at hand
+    save_records({site: record})
+
+def save_records(records: dict) -> None:
+    # save_record for many entries, {site: record}, under one lock
+    with span("history.save") as sp:
+        now = int(time.time())
+        _append(*({"site": site, "rev": vault_io.record_rev(record), "time": now, "digest": None,
+                   "attachments": list(record.get("attachments", ())),
+                   "record": {k: v for k, v in record.items() if k != "rev"}}
+                  for site, record in records.items()))
+        sp.entries = len(records)
+
+def list_revisions(site: str) -> list[dict]:
+    # Newest first; nothing is decrypted
+    return [{"rev": revision["rev"], "time": revision["time"]} for revision in reversed(_read(site))]
+
+def _find(site: str, rev: int) -> dict:
+    for revision in reversed(_read(site)):
+        if revision["rev"] == rev:
+            return revision
+    raise HistoryError(f"No revision {rev} in the history of '{site}'.")
+
+def open_revision(master_password: str, site: str, rev: int) -> dict:
+    with span("history.open"):
+        try:
+            return decrypt_record_strict(master_password, _find(site, rev)["record"])
+        except DecryptionError:
+            raise HistoryError("Master password does not open this revision.") from None
+
+def restore_revision(master_password: str, site: str, rev: int) -> int:
+    """Make revision rev the entry's current content; returns the new rev.
+
+    Only that revision is decrypted, to check the master password opens it.
+    The content it replaces is kept as a revision first, so a restore can
+    itself be undone. An empty master password (key agent) skips the check.
+    """
+    with span("history.restore"):
+        revision = _find(site, rev)
+        if master_password:
+            open_revision(master_password, site, rev)
+        current = vault_io.get_entry(site)
+        if current is not None:
+            save_record(site, current)
+        record = dict(revision["record"])
+        if revision.get("attachments"):
+            record["attachments"] = list(revision["attachments"])
+        return vault_io.put_entry(site, record, vault_io.record_rev(current))
+
+def referenced_blobs(site: str | None = None) -> set[str]:
+    # Attachment blobs that revisions of site (or of any entry) point to
+    if site is not None:
+        return {blob_id for revision in _read(site) for blob_id in revision.get("attachments", ())}
+    return {blob_id for revisions in load_all().values()
+            for revision in revisions for blob_id in revision.get("attachments", ())}
+
+def load_all() -> dict[str, list[dict]]:
+    # {file path: revisions}, for whole-vault jobs such as rekey
+    histories = {}
+    try:
+        names = os.listdir(history_dir())
+    except FileNotFoundError:
+        return histories
+    for name in names:
+        if name.endswith(".jsonl"):
+            path = os.path.join(history_dir(), name)
+            with open(path, "rb") as f:
+                histories[path] = _parse(f.read())
+    return histories
+
+def replace_all(histories: dict[str, list[dict]]) -> None:
+    with _Locked():
+        for path, revisions in histories.items():
+            _write(path, revisions)
@@ -0,0 +1,96 @@
+import os
+import json
+import time
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
+
+# Password-stretching parameters, stored per record under "kdf":
+#   {"alg": "pbkdf2-sha512", "iterations": 600000}
+#   {"alg": "scrypt", "n": 131072, "r": 8, "p": 1}
+#   {"alg": "argon2id", "iterations": 3, "memory_kib": 65536, "lanes": 4}
+# Records without "kdf" predate this and use crypto.LEGACY_KDF.
+PBKDF2 = "pbkdf2-sha512"
+SCRYPT = "scrypt"
+ARGON2ID = "argon2id"
+ALGORITHMS = (PBKDF2, SCRYPT, ARGON2ID)
+
+# Calibration
+DEFAULT_TARGET_SECONDS = 0.5
+MIN_PBKDF2_ITERATIONS = 100_000
+MIN_SCRYPT_N = 2 ** 14
+MAX_SCRYPT_N = 2 ** 20       # 1 GiB at r=8
+ARGON2_MEMORY_KIB = 64 * 1024
+MIN_ARGON2_ITERATIONS = 2
+
+
+class UnsupportedKdf(ValueError):
+    pass
+
+
+def params_id(params: dict) -> str:
+    # Canonical form, used to tell parameter sets apart in caches
+    return json.dumps(params, sort_keys=True, separators=(",", ":"))
+
+def make_kdf(params: dict, salt: bytes, length: int):
+    alg = params.get("alg")
+    if alg == PBKDF2:
+        return PBKDF2HMAC(
+            algorithm=hashes.SHA512(),
+            length=length,
+            salt=salt,
+            iterations=int(params["iterations"])
+        )
+    if alg == SCRYPT:
+        return Scrypt(salt=salt, length=length, n=int(params["n"]), r=int(params["r"]), p=int(params["p"]))
+    if alg == ARGON2ID:
+        try:
+            from cryptography.hazmat.primitives.kdf.argon2 import Argon2id
+        except ImportError:
+            raise UnsupportedKdf("Argon2id needs cryptography 44 or newer.") from None
+        return Argon2id(
+            salt=salt,
+            length=length,
+            iterations=int(params["iterations"]),
+            lanes=int(params["lanes"]),
+            memory_cost=int(params["memory_kib"])
+        )
+    raise UnsupportedKdf(f"Unknown KDF '{alg}'.")
+
+
+def _time_params(params: dict) -> float:
+    kdf = make_kdf(params, os.urandom(16), 32)
+    start = time.perf_counter()
+    kdf.derive(b"vaultsafe calibration probe")
+    return time.perf_counter() - start
+
+def calibrate(target_seconds: float = DEFAULT_TARGET_SECONDS, alg: str = PBKDF2) -> dict:
+    """Pick parameters for `alg` that take about target_seconds on this machine.
+
+    Cost is measured with a small probe run and scaled linearly; the result
+    never drops below the MIN_* floors, so a slow machine gets a slower
+    unlock rather than weaker protection.
+    """
+    if alg == PBKDF2:
+        probe = 50_000
+        elapsed = _time_params({"alg": PBKDF2, "iterations": probe})
+        iterations = int(probe * target_seconds / elapsed) // 10_000 * 10_000
+        return {"alg": PBKDF2, "iterations": max(MIN_PBKDF2_ITERATIONS, iterations)}
+
+    if alg == SCRYPT:
+        n = MIN_SCRYPT_N
+        elapsed = _time_params({"alg": SCRYPT, "n": n, "r": 8, "p": 1})
+        # Cost (time and memory) is linear in n, which must be a power of two
+        while n < MAX_SCRYPT_N and elapsed * 2 <= target_seconds:
+            n *= 2
+            elapsed *= 2
+        return {"alg": SCRYPT, "n": n, "r": 8, "p": 1}
+
+    if alg == ARGON2ID:
+        lanes = min(4, os.cpu_count() or 1)
+        base = {"alg": ARGON2ID, "memory_kib": ARGON2_MEMORY_KIB, "lanes": lanes}
+        elapsed = _time_params({**base, "iterations": 1})
+        iterations = max(MIN_ARGON2_ITERATIONS, int(target_seconds / elapsed))
+        return {**base, "iterations": iterations}
+
+    raise UnsupportedKdf(f"Unknown KDF '{alg}'.")
@@ -0,0 +1,36 @@
+import base64
+
+from core.crypto import decrypt_record_strict, derive_key, encrypt_record, is_v2_record, vault_key_id
+from core.secret import wipe_values
+
+# Helpers for code that handles encrypted records in bulk (rekey, import
+# and export, attachments, audit, search).
+
+# Fields written by encrypt_record(). "bi" is keyed by the vault key, so it
+# is recomputed rather than kept when a record is re-encrypted.
+CRYPTO_FIELDS = ("v", "vs", "kdf", "salt", "iv", "ciphertext", "bi")
+
+
+def vault_keys(password: str, vault: dict) -> dict[str, bytes]:
+    # One slow KDF per distinct (vault salt, KDF parameters) among v2
+    # records — normally just one
+    keys = {}
+    for record in vault.values():
+        if is_v2_record(record) and vault_key_id(record) not in keys:
+            keys[vault_key_id(record)] = derive_key(password, base64.b64decode(record["vs"]), record.get("kdf"))
+    return keys
+
+
+def reencrypt_record(old_password: str, old_vault_keys: dict[str, bytes],
+                     new_password: str, new_vault_salt: bytes | None,
+                     new_vault_key: bytes | None, new_kdf: dict | None, record: dict,
+                     compress: bool = False, blind_index: bool = False) -> dict:
+    # Runs in a worker process. v1 records cost one slow KDF each way;
+    # v2 records only cost HKDF, since the vault keys were derived up front.
+    data = decrypt_record_strict(old_password, record, old_vault_keys, secret=True)
+    try:
+        kept = {field: value for field, value in record.items() if field not in CRYPTO_FIELDS}
+        return {**kept, **encrypt_record(new_password, data, new_vault_salt, new_vault_key, new_kdf,
+                                         compress, blind_index)}
+    finally:
+        wipe_values(data)
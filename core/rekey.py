@@ -0,0 +1,123 @@
+import os
+import base64
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable
+
+from core.crypto import SALT_LENGTH, DecryptionError, derive_key, is_v2_record
+from core import history
+from core.records import reencrypt_record, vault_keys
+from core.vault_io import load_vault, save_vault, load_meta, save_meta
+
+
+class RekeyError(Exception):
+    pass
+
+
+def _reencrypt_all(records: dict, args: tuple, on_progress, max_workers, compressed=frozenset(),
+                   blind_index: bool = False, skip_failed: bool = False) -> dict:
+    # With skip_failed, records that do not decrypt are left out of the
+    # result instead of failing the whole run
+    total = len(records)
+    if not total:
+        return {}
+    done_records = {}
+    workers = max_workers or min(total, os.cpu_count() or 1)
+    # spawn, not fork: the GUI runs this from a worker thread, and a forked
+    # child would inherit Qt state and locks held elsewhere
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        futures = {
+            pool.submit(reencrypt_record, *args, record, site in compressed, blind_index): site
+            for site, record in records.items()
+        }
+        try:
+            for done, future in enumerate(as_completed(futures), 1):
+                site = futures[future]
+                try:
+                    done_records[site] = future.result()
+                except DecryptionError:
+                    if not skip_failed:
+                        raise RekeyError(f"Entry '{site}' did not decrypt with the current master password; vault unchanged.") from None
+                if on_progress:
+                    on_progress(done, total)
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+    return {site: done_records[site] for site in records if site in done_records}
+
+
+def rekey_vault(old_password: str, new_password: str,
+                on_progress: Callable[[int, int], None] | None = None,
+                max_workers: int | None = None) -> dict:
+    """Re-encrypt every entry under a new master password.
+
+    Entries are processed in parallel across CPU cores. The vault is
+    committed in a single atomic save only after every entry succeeded; on
+    any failure the existing vault is left untouched. A format v2 vault
+    also gets a fresh vault salt. Entry history is re-encrypted alongside
+    and written once the vault is saved; revisions that were saved under
+    some other master password are kept unchanged rather than failing the
+    rekey. Returns {"rekeyed": n, "history_skipped": n}.
+    """
+    vault = load_vault()
+    if not vault:
+        return {"rekeyed": 0, "history_skipped": 0}
+
+    # Revisions go through the same pool, under names no entry can have
+    histories = history.load_all()
+    revisions = {f"{path}#{i}": revision["record"]
+                 for path, entries in histories.items() for i, revision in enumerate(entries)}
+
+    meta = load_meta()
+    new_kdf = meta.get("kdf")
+    new_vault_salt = os.urandom(SALT_LENGTH) if meta.get("salt") else None
+    new_vault_key = derive_key(new_password, new_vault_salt, new_kdf) if new_vault_salt else None
+    blind_index = bool(new_vault_salt and meta.get("blind_index"))
+    args = (old_password, vault_keys(old_password, {**vault, **revisions}),
+            new_password, new_vault_salt, new_vault_key, new_kdf)
+
+    new_revisions = _reencrypt_all(revisions, args, None, max_workers, compressed=revisions.keys(),
+                                   blind_index=blind_index, skip_failed=True)
+    # base=vault: an entry written meanwhile fails the save rather than
+    # being lost or left under the old password
+    save_vault(_reencrypt_all(vault, args, on_progress, max_workers, blind_index=blind_index), base=vault)
+    # Digests were keyed by the old vault key, so they are dropped
+    history.replace_all({
+        path: [{**revision, "digest": None, "record": new_revisions[f"{path}#{i}"]}
+               if f"{path}#{i}" in new_revisions else revision
+               for i, revision in enumerate(entries)]
+        for path, entries in histories.items()
+    })
+    if new_vault_salt:
+        # v2 records carry their own vault salt, so a crash before this line
+        # only means new entries keep using the previous salt
+        save_meta({**meta, "salt": base64.b64encode(new_vault_salt).decode()})
+    return {"rekeyed": len(vault), "history_skipped": len(revisions) - len(new_revisions)}
+
+
+def migrate_to_v2(master_password: str,
+                  on_progress: Callable[[int, int], None] | None = None,
+                  max_workers: int | None = None) -> int:
+    """Switch the vault to format v2 and convert every v1 entry.
+
+    After this, new entries use the vault-level key hierarchy and opening
+    any number of entries costs one slow KDF per session.
+    """
+    meta = load_meta()
+    if not meta.get("salt"):
+        meta = {**meta, "format": 2, "salt": base64.b64encode(os.urandom(SALT_LENGTH)).decode()}
+        save_meta(meta)
+    vault_salt = base64.b64decode(meta["salt"])
+    vault_key = derive_key(master_password, vault_salt, meta.get("kdf"))
+
+    vault = load_vault()
+    legacy = {site: record for site, record in vault.items() if not is_v2_record(record)}
+    if not legacy:
+        return 0
+
+    args = (master_password, {}, master_password, vault_salt, vault_key, meta.get("kdf"))
+    converted = _reencrypt_all(legacy, args, on_progress, max_workers, blind_index=bool(meta.get("blind_index")))
+    save_vault({**vault, **converted}, base=vault)
+    return len(legacy)
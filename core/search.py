@@ -0,0 +1,104 @@
+import base64
+from typing import Callable
+
+from core import records, vault_io
+from core.agent import AgentUnavailable, agent_decrypt, agent_tokens
+from core.blind_index import entry_terms, entry_tokens, normalize, term_token
+from core.crypto import DecryptionError, decrypt_record_strict, derive_key, index_key, is_v2_record, vault_key_id
+from core.instrument import span
+
+# Search over encrypted usernames and tags through the blind index
+# (core.blind_index). A search costs one slow KDF per vault key (normally
+# one), a token lookup per entry and a decrypt of the candidates only; the
+# decrypt confirms each match, so a truncated-token collision never shows.
+# A wrong master password yields tokens that match nothing.
+
+
+class SearchError(Exception):
+    pass
+
+
+def search_entries(master_password: str, term: str) -> dict:
+    """Entries whose username or tags match term ("@domain" matches every
+    email username at that domain). An empty master password uses the key
+    agent. Returns {"matches": [{"site", "username"}], "unindexed": [site]};
+    unindexed entries (format v1, or written before the index was built)
+    were not searched.
+    """
+    term = normalize(term)
+    if not term:
+        raise SearchError("Search term cannot be empty.")
+
+    with span("search.entries") as sp:
+        # Records indexed under each vault key
+        groups = {}
+        unindexed = []
+        for site, record in vault_io.load_vault().items():
+            if is_v2_record(record) and "bi" in record:
+                groups.setdefault(vault_key_id(record), {})[site] = record
+            else:
+                unindexed.append(site)
+
+        matches = []
+        decrypted = 0
+        for key_id, group in groups.items():
+            sample = next(iter(group.values()))
+            if master_password:
+                vault_key = derive_key(master_password, base64.b64decode(sample["vs"]), sample.get("kdf"))
+                token = term_token(index_key(vault_key), term)
+            else:
+                tokens = agent_tokens(sample, [term])
+                if tokens is None:
+                    raise AgentUnavailable("The key agent cannot search this vault; enter the master password.")
+                token = tokens[0]
+
+            for site, record in group.items():
+                if token not in record["bi"]:
+                    continue
+                decrypted += 1
+                if master_password:
+                    try:
+                        data = decrypt_record_strict(master_password, record, {key_id: vault_key})
+                    except DecryptionError:
+                        continue
+                else:
+                    data = agent_decrypt(record) or {}
+                if term in entry_terms(data):
+                    matches.append({"site": site, "username": data.get("username", "")})
+        sp.entries = decrypted
+
+    return {"matches": sorted(matches, key=lambda match: match["site"]), "unindexed": sorted(unindexed)}
+
+
+def build_index(master_password: str, on_progress: Callable[[int, int], None] | None = None) -> int:
+    """Turn the blind index on and add tokens to every format v2 entry.
+
+    From then on new and updated entries carry tokens as they are written.
+    Entries are decrypted once here, in-process: v2 entries only cost HKDF.
+    The tokens land in one save, conditional on no entry changing meanwhile.
+    Returns the number of entries indexed.
+    """
+    meta = vault_io.load_meta()
+    if not meta.get("salt"):
+        raise SearchError("The blind index needs a format v2 vault; run `migrate` first.")
+
+    vault = vault_io.load_vault()
+    vault_keys = records.vault_keys(master_password, vault)
+    todo = {site: record for site, record in vault.items() if is_v2_record(record)}
+    indexed = {}
+    with span("search.build_index") as sp:
+        for done, (site, record) in enumerate(todo.items(), 1):
+            try:
+                data = decrypt_record_strict(master_password, record, vault_keys)
+            except DecryptionError:
+                raise SearchError(f"Entry '{site}' did not decrypt with this master password; index unchanged.") from None
+            indexed[site] = {**record, "bi": entry_tokens(index_key(vault_keys[vault_key_id(record)]), data)}
+            if on_progress:
+                on_progress(done, len(todo))
+        sp.entries = len(indexed)
+    if not meta.get("blind_index"):
+        # Before the save: an entry written after this carries its own
+        # tokens, one written before it fails the save below
+        vault_io.save_meta({**meta, "blind_index": True})
+    vault_io.save_vault({**vault, **indexed}, base=vault)
+    return len(indexed)
@@ -0,0 +1,154 @@
+import hmac
+import json
+import zlib
+import struct
+
+# Entry plaintext encodings. Records written before this are JSON text and
+# always start with "{"; new ones start with PLAINTEXT_V1, a byte no JSON
+# document can begin with, followed by fields:
+#   <BBI> (value type, key length, value length) | key | value
+# String values are stored as raw UTF-8, so they can be copied straight into
+# and out of a SecretBuffer; anything else (attachment lists) is JSON.
+# PLAINTEXT_ZLIB is a zlib-compressed PLAINTEXT_V1 body, used for history
+# revisions when it is actually smaller.
+PLAINTEXT_V1 = 0x01
+PLAINTEXT_ZLIB = 0x02
+_STR = 0
+_JSON = 1
+_FIELD = struct.Struct("<BBI")
+
+
+class SecretBuffer:
+    """Mutable secret bytes that can be zeroed in place.
+
+    Holds one secret in a bytearray and hands out memoryviews of it, so
+    passing it to the KDF, HMAC or AES-GCM makes no copies. wipe() (also
+    run on context exit and on garbage collection) overwrites the contents.
+    reveal() returns a str for display; that copy is immutable and cannot
+    be wiped, so only call it where a str is unavoidable (Qt widgets).
+    """
+
+    __slots__ = ("_buf",)
+
+    def __init__(self, data=0):
+        self._buf = bytearray(data)
+
+    @classmethod
+    def from_str(cls, text: str) -> "SecretBuffer":
+        return cls(text.encode())
+
+    def view(self) -> memoryview:
+        return memoryview(self._buf)
+
+    def reveal(self) -> str:
+        return self._buf.decode()
+
+    def wipe(self) -> None:
+        self._buf[:] = bytes(len(self._buf))
+
+    def __len__(self) -> int:
+        return len(self._buf)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, SecretBuffer):
+            return NotImplemented
+        return hmac.compare_digest(self._buf, other._buf)
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"<SecretBuffer len={len(self._buf)}>"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.wipe()
+        return False
+
+    def __del__(self):
+        if getattr(self, "_buf", None) is not None:
+            self.wipe()
+
+
+Secret = str | SecretBuffer
+
+def secret_bytes(secret: Secret):
+    # Bytes-like view of a password; a str costs one (unwipeable) encode
+    if isinstance(secret, SecretBuffer):
+        return secret.view()
+    return secret.encode()
+
+def wipe_values(data: dict) -> None:
+    for value in data.values():
+        if isinstance(value, SecretBuffer):
+            value.wipe()
+
+
+def encode_plaintext(data: dict, compress: bool = False) -> SecretBuffer:
+    fields = []
+    for key, value in data.items():
+        name = key.encode()
+        if len(name) > 255:
+            raise ValueError(f"Field name too long: {key[:32]}…")
+        if isinstance(value, SecretBuffer):
+            fields.append((_STR, name, value.view()))
+        elif isinstance(value, str):
+            fields.append((_STR, name, value.encode()))
+        else:
+            fields.append((_JSON, name, json.dumps(value, separators=(",", ":")).encode()))
+
+    out = SecretBuffer(1 + sum(_FIELD.size + len(name) + len(raw) for _, name, raw in fields))
+    buf = out._buf
+    buf[0] = PLAINTEXT_V1
+    pos = 1
+    for kind, name, raw in fields:
+        _FIELD.pack_into(buf, pos, kind, len(name), len(raw))
+        pos += _FIELD.size
+        buf[pos:pos + len(name)] = name
+        pos += len(name)
+        buf[pos:pos + len(raw)] = raw
+        pos += len(raw)
+    if compress:
+        # zlib hands back immutable bytes: one unwipeable (compressed) copy
+        packed = zlib.compress(out.view(), 9)
+        if 1 + len(packed) < len(out):
+            out.wipe()
+            out = SecretBuffer(1 + len(packed))
+            out._buf[0] = PLAINTEXT_ZLIB
+            out._buf[1:] = packed
+    return out
+
+def decode_plaintext(plaintext, secret: bool = False) -> dict:
+    """Decode either encoding. With secret=True, string fields come back as
+    SecretBuffers copied straight from the plaintext, never as str."""
+    view = memoryview(plaintext)
+    if len(view) and view[0] == PLAINTEXT_ZLIB:
+        view = memoryview(zlib.decompress(view[1:]))
+        if not len(view) or view[0] != PLAINTEXT_V1:
+            raise ValueError("Bad compressed plaintext.")
+    if len(view) and view[0] == PLAINTEXT_V1:
+        data = {}
+        pos = 1
+        while pos < len(view):
+            kind, name_length, value_length = _FIELD.unpack_from(view, pos)
+            pos += _FIELD.size
+            name = str(view[pos:pos + name_length], "utf-8")
+            pos += name_length
+            raw = view[pos:pos + value_length]
+            pos += value_length
+            if pos > len(view):
+                raise ValueError("Truncated plaintext.")
+            if kind == _STR:
+                data[name] = SecretBuffer(raw) if secret else str(raw, "utf-8")
+            elif kind == _JSON:
+                data[name] = json.loads(bytes(raw))
+            else:
+                raise ValueError(f"Unknown field type {kind}.")
+        return data
+
+    data = json.loads(bytes(view))
+    if secret:
+        data = {key: SecretBuffer.from_str(value) if isinstance(value, str) else value
+                for key, value in data.items()}
+    return data
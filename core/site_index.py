@@ -0,0 +1,132 @@
+import bisect
+
+# Above any real character, for the upper bound of a prefix range
+_PREFIX_END = "\U0010ffff"
+
+
+def _key(site: str) -> tuple[str, str]:
+    # Case-insensitive order, ties broken by the raw name
+    return site.casefold(), site
+
+def _trigrams(text: str) -> set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class SiteIndex:
+    """Sorted site list with prefix and trigram lookup.
+
+    add()/remove() keep both structures current incrementally, so the index
+    is built once and never re-sorted. The trigram map is built on demand,
+    either in slices through build_trigrams(limit) or all at once by the
+    first substring search.
+    """
+
+    def __init__(self, sites=()):
+        self._keys = sorted(_key(site) for site in sites)
+        self._sites = [site for _, site in self._keys]
+        self._trigrams: dict[str, set[str]] | None = None
+        # Sites still to be added to the trigram map, as (folded, site)
+        self._unindexed: list[tuple[str, str]] = []
+
+    def build_trigrams(self, limit: int | None = None) -> bool:
+        """Add up to limit more sites (all if None) to the trigram map.
+
+        Returns True once the map is complete. Sites added meanwhile are
+        indexed as they come; removed ones are skipped.
+        """
+        if self._trigrams is None:
+            self._trigrams = {}
+            self._unindexed = self._keys[::-1]
+        count = len(self._unindexed) if limit is None else min(limit, len(self._unindexed))
+        for _ in range(count):
+            key = self._unindexed.pop()
+            if self.row(key[1]) is not None:
+                self._index_trigrams(*key)
+        return not self._unindexed
+
+    def _index_trigrams(self, folded: str, site: str) -> None:
+        if self._trigrams is None:
+            return
+        for gram in _trigrams(folded):
+            self._trigrams.setdefault(gram, set()).add(site)
+
+    def __len__(self) -> int:
+        return len(self._sites)
+
+    def __getitem__(self, row: int) -> str:
+        return self._sites[row]
+
+    def __contains__(self, site: str) -> bool:
+        return self.row(site) is not None
+
+    @property
+    def sites(self) -> list[str]:
+        # Live, sorted view; do not mutate
+        return self._sites
+
+    def row(self, site: str) -> int | None:
+        key = _key(site)
+        pos = bisect.bisect_left(self._keys, key)
+        if pos < len(self._keys) and self._keys[pos] == key:
+            return pos
+        return None
+
+    def insert_position(self, site: str) -> int:
+        return bisect.bisect_left(self._keys, _key(site))
+
+    def add(self, site: str) -> int | None:
+        # Returns the row the site was inserted at, or None if already present
+        key = _key(site)
+        pos = bisect.bisect_left(self._keys, key)
+        if pos < len(self._keys) and self._keys[pos] == key:
+            return None
+        self._keys.insert(pos, key)
+        self._sites.insert(pos, site)
+        self._index_trigrams(key[0], site)
+        return pos
+
+    def remove(self, site: str) -> int | None:
+        pos = self.row(site)
+        if pos is None:
+            return None
+        folded, _ = self._keys.pop(pos)
+        del self._sites[pos]
+        if self._trigrams is None:
+            return pos
+        for gram in _trigrams(folded):
+            bucket = self._trigrams.get(gram)
+            if bucket is not None:
+                bucket.discard(site)
+                if not bucket:
+                    del self._trigrams[gram]
+        return pos
+
+    def search(self, query: str) -> list[str]:
+        """Sites starting with query first, then other sites containing it."""
+        folded = query.casefold()
+        if not folded:
+            return list(self._sites)
+
+        lo = bisect.bisect_left(self._keys, (folded,))
+        hi = bisect.bisect_left(self._keys, (folded + _PREFIX_END,))
+        matches = self._sites[lo:hi]
+        if len(folded) < 3:
+            return matches
+
+        self.build_trigrams()
+        trigrams = self._trigrams
+        grams = sorted(_trigrams(folded), key=lambda g: len(trigrams.get(g, ())))
+        candidates = set(trigrams.get(grams[0], ()))
+        for gram in grams[1:]:
+            if not candidates:
+                break
+            candidates &= trigrams.get(gram, set())
+        candidates.difference_update(matches)
+
+        if len(candidates) * 8 > len(self._sites):
+            # Broad query: a pass in index order beats sorting the candidates
+            contained = [site for site in self._sites
+                         if site in candidates and folded in site.casefold()]
+        else:
+            contained = sorted((site for site in candidates if folded in site.casefold()), key=_key)
+        return matches + contained
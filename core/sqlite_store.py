@@ -0,0 +1,254 @@
+import os
+import json
+import shutil
+import sqlite3
+import threading
+
+from core import vault_io
+from core.instrument import span
+from core.vault_io import VaultBackend, VersionConflict, account_key, entry_site, record_rev
+
+# SQLite vault: one row per account, so single-entry reads and writes and
+# per-site account listings are indexed lookups instead of a full parse.
+#
+#   entries(key, site, rev, record)   key: entry name (site, "site (2)", ...)
+#                                     site: entry_site(key), indexed
+#                                     record: the record JSON minus "rev"
+#   meta(id = 1, data)                what vault.json.meta holds
+#
+# WAL journaling lets readers run alongside the single writer, in this
+# process or others. Writes run in BEGIN IMMEDIATE transactions, so the
+# rev check and the write are atomic. Statements are module constants with
+# parameters; sqlite3 keeps them prepared in each connection's cache.
+SCHEMA_VERSION = 1
+BUSY_TIMEOUT = 30            # seconds to wait for another writer
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key     TEXT PRIMARY KEY,
+    site    TEXT NOT NULL,
+    rev     INTEGER NOT NULL,
+    record  TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_site ON entries (site);
+CREATE TABLE IF NOT EXISTS meta (
+    id      INTEGER PRIMARY KEY CHECK (id = 1),
+    data    TEXT NOT NULL
+);
+"""
+_SELECT_ALL = "SELECT key, rev, record FROM entries"
+_SELECT_ONE = "SELECT rev, record FROM entries WHERE key = ?"
+_SELECT_REV = "SELECT rev FROM entries WHERE key = ?"
+_SELECT_SITE = "SELECT key FROM entries WHERE site = ? ORDER BY rowid"
+_UPSERT = ("INSERT INTO entries (key, site, rev, record) VALUES (?, ?, ?, ?) "
+           "ON CONFLICT (key) DO UPDATE SET rev = excluded.rev, record = excluded.record")
+# Unconditional write: rev continues from whatever is stored
+_UPSERT_BUMP = ("INSERT INTO entries (key, site, rev, record) VALUES (?, ?, 1, ?) "
+                "ON CONFLICT (key) DO UPDATE SET rev = entries.rev + 1, record = excluded.record")
+_DELETE = "DELETE FROM entries WHERE key = ?"
+_SELECT_META = "SELECT data FROM meta WHERE id = 1"
+_UPSERT_META = "INSERT INTO meta (id, data) VALUES (1, ?) ON CONFLICT (id) DO UPDATE SET data = excluded.data"
+
+
+class SqliteStoreError(Exception):
+    pass
+
+
+def _record_json(record: dict) -> str:
+    return json.dumps({k: v for k, v in record.items() if k != "rev"}, separators=(",", ":"))
+
+def _row_record(rev: int, raw: str) -> dict:
+    return {**json.loads(raw), "rev": rev}
+
+
+class SqliteBackend(VaultBackend):
+    """VaultBackend over a SQLite database in WAL mode.
+
+    Connections are per thread (sqlite3 objects must not cross threads),
+    so GUI worker threads read in parallel with each other and the GUI.
+    """
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        # One connection per thread; a thread's connection is closed when
+        # the thread exits and its local is dropped, or by close()
+        self._local = threading.local()
+
+    def _db(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            # isolation_level=None: no implicit transactions; writes open
+            # their own with BEGIN IMMEDIATE
+            db = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, isolation_level=None)
+            db.execute("PRAGMA journal_mode = WAL")
+            db.execute("PRAGMA synchronous = FULL")  # fsync each commit, like the JSON log
+            version = db.execute("PRAGMA user_version").fetchone()[0]
+            if version > SCHEMA_VERSION:
+                db.close()
+                raise SqliteStoreError(f"{self.path} was written by a newer VaultSafe (schema {version}).")
+            if version < SCHEMA_VERSION:
+                db.executescript(_SCHEMA)
+                db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            self._local.db = db
+        return db
+
+    def _write(self):
+        # Context manager for one write transaction
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        return _Transaction(db)
+
+    def paths(self) -> tuple[str, ...]:
+        return self.path, self.path + "-wal"
+
+    def load(self) -> dict:
+        with span("io.load_vault") as sp:
+            vault = {}
+            read = 0
+            for key, rev, raw in self._db().execute(_SELECT_ALL):
+                vault[key] = _row_record(rev, raw)
+                read += len(raw)
+            sp.bytes_read = read
+            sp.entries = len(vault)
+            return vault
+
+    def get(self, site: str) -> dict | None:
+        with span("io.get_entry") as sp:
+            row = self._db().execute(_SELECT_ONE, (site,)).fetchone()
+            if row is None:
+                return None
+            sp.bytes_read = len(row[1])
+            sp.entries = 1
+            return _row_record(*row)
+
+    def accounts(self, site: str) -> list[str]:
+        return [key for (key,) in self._db().execute(_SELECT_SITE, (site,))]
+
+    def _rev(self, db: sqlite3.Connection, site: str) -> int:
+        row = db.execute(_SELECT_REV, (site,)).fetchone()
+        return row[0] if row else 0
+
+    def save(self, vault: dict, base: dict | None = None) -> None:
+        with span("io.save_vault") as sp, self._write() as db:
+            live = {key: (rev, raw) for key, rev, raw in db.execute(_SELECT_ALL)}
+            if base is not None:
+                for site in base.keys() | live.keys():
+                    actual = live[site][0] if site in live else 0
+                    if record_rev(base.get(site)) != actual:
+                        raise VersionConflict(site, record_rev(base.get(site)), actual)
+            puts = []
+            for site, record in vault.items():
+                raw = _record_json(record)
+                if site not in live or live[site][1] != raw:
+                    rev = live[site][0] + 1 if site in live else 1
+                    puts.append((site, entry_site(site), rev, raw))
+            dels = [(site,) for site in live if site not in vault]
+            db.executemany(_UPSERT, puts)
+            db.executemany(_DELETE, dels)
+            sp.bytes_written = sum(len(row[3]) for row in puts)
+            sp.entries = len(puts) + len(dels)
+
+    def put(self, site: str, record: dict, expected_rev: int | None = None) -> int:
+        with span("io.put_entry") as sp, self._write() as db:
+            actual = self._rev(db, site)
+            if expected_rev is not None and expected_rev != actual:
+                raise VersionConflict(site, expected_rev, actual)
+            raw = _record_json(record)
+            db.execute(_UPSERT, (site, entry_site(site), actual + 1, raw))
+            sp.bytes_written = len(raw)
+            sp.entries = 1
+            return actual + 1
+
+    def put_many(self, records: dict) -> None:
+        with span("io.put_entries") as sp, self._write() as db:
+            rows = [(site, entry_site(site), _record_json(record)) for site, record in records.items()]
+            db.executemany(_UPSERT_BUMP, rows)
+            sp.bytes_written = sum(len(row[2]) for row in rows)
+            sp.entries = len(rows)
+
+    def add(self, site: str, record: dict) -> str:
+        with span("io.add_entry") as sp, self._write() as db:
+            n = 1
+            while self._rev(db, account_key(site, n)):
+                n += 1
+            key = account_key(site, n)
+            raw = _record_json(record)
+            db.execute(_UPSERT, (key, entry_site(key), 1, raw))
+            sp.bytes_written = len(raw)
+            sp.entries = 1
+            return key
+
+    def delete(self, site: str, expected_rev: int | None = None) -> None:
+        with span("io.delete_entry") as sp, self._write() as db:
+            actual = self._rev(db, site)
+            if expected_rev is not None and expected_rev != actual:
+                raise VersionConflict(site, expected_rev, actual)
+            sp.entries = db.execute(_DELETE, (site,)).rowcount
+
+    def compact(self) -> None:
+        # Fold the WAL back into the database file and drop it
+        with span("io.compact_vault"):
+            db = self._db()
+            db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            db.execute("PRAGMA optimize")
+
+    def load_meta(self) -> dict:
+        row = self._db().execute(_SELECT_META).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def save_meta(self, meta: dict) -> None:
+        with self._write() as db:
+            db.execute(_UPSERT_META, (json.dumps(meta),))
+
+    def close(self) -> None:
+        # The calling thread's connection only: another thread may be in the
+        # middle of a transaction on its own
+        db = getattr(self._local, "db", None)
+        if db is not None:
+            self._local.db = None
+            db.close()
+
+
+class _Transaction:
+    def __init__(self, db: sqlite3.Connection):
+        self.db = db
+
+    def __enter__(self) -> sqlite3.Connection:
+        return self.db
+
+    def __exit__(self, exc_type, *exc):
+        self.db.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+def migrate_json_to_sqlite(json_path: str, db_path: str) -> int:
+    """Copy a JSON vault, its settings, attachment blobs and entry history
+    into a new SQLite vault, the entries in one transaction. The JSON vault
+    is left as it is.
+
+    Returns the number of entries copied.
+    """
+    if os.path.exists(db_path) and vault_io.open_backend(db_path).load():
+        raise SqliteStoreError(f"{db_path} already holds entries.")
+    source = vault_io.open_backend(json_path)
+    vault = source.load()
+    meta = source.load_meta()
+
+    target = vault_io.open_backend(db_path)
+    if not isinstance(target, SqliteBackend):
+        raise SqliteStoreError(f"{db_path} is not a SQLite vault path (use .db or .sqlite).")
+    with span("io.migrate_sqlite") as sp, target._write() as db:
+        db.executemany(_UPSERT, [(key, entry_site(key), record_rev(record), _record_json(record))
+                                 for key, record in vault.items()])
+        if meta:
+            db.execute(_UPSERT_META, (json.dumps(meta),))
+        sp.entries = len(vault)
+
+    # Attachment blobs and entry history live beside the vault file
+    # (attachments.blob_dir, history.history_dir); revisions may point at
+    # blobs, so both move or prune would drop blobs still in use
+    for suffix in (".blobs", ".history"):
+        source_dir = json_path + suffix
+        if os.path.isdir(source_dir) and not os.path.exists(db_path + suffix):
+            shutil.copytree(source_dir, db_path + suffix, ignore=shutil.ignore_patterns(".lock", "*.tmp"))
+    return len(vault)
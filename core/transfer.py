@@ -0,0 +1,366 @@
+import os
+import csv
+import json
+import base64
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Callable, Iterable, Iterator
+from urllib.parse import urlsplit
+
+from core.crypto import (
+    SALT_LENGTH, DecryptionError, derive_key, is_v2_record, vault_key_id,
+    decrypt_record_strict, encrypt_record
+)
+from core import history, records, vault_io
+
+# Bulk import and export, streamed in batches.
+#
+# Readers yield (site, {"username", "password"}) one row at a time; rows are
+# encrypted a batch at a time and each batch is committed as one log line
+# (vault_io.put_entries), so memory stays at about two batches whatever the
+# file size. Format v1 vaults pay one slow KDF per entry and are spread over
+# a process pool; format v2 vaults derive the vault key once and encrypt
+# in-process, where a pool would only add pickling overhead.
+BATCH_SIZE = 256
+EXPORT_FORMAT = "vaultsafe-export"
+EXPORT_VERSION = 1
+FORMATS = ("csv", "bitwarden-json", EXPORT_FORMAT)
+
+# Header names used by VaultSafe, Bitwarden, KeePass 2, KeePassXC and
+# browser CSV exports, most specific first
+_URL_COLUMNS = ("site", "url", "login_uri", "web site", "website")
+_NAME_COLUMNS = ("name", "title", "account")
+_USERNAME_COLUMNS = ("username", "login_username", "login name", "user name", "login")
+_PASSWORD_COLUMNS = ("password", "login_password")
+
+
+class TransferError(Exception):
+    pass
+
+
+# === Readers ===
+
+def _site_name(url: str, name: str) -> str:
+    # github.com for https://github.com/login; the item name when there is no URL
+    url = url.strip()
+    if url:
+        host = urlsplit(url if "//" in url else "//" + url).hostname
+        if host:
+            return host
+    return name.strip()
+
+def _first(row: dict, columns: tuple) -> str:
+    for column in columns:
+        if row.get(column):
+            return row[column]
+    return ""
+
+def read_csv(path: str) -> Iterator[tuple[str, dict]]:
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f):
+            row = {(key or "").strip().lower(): value or "" for key, value in row.items()}
+            site = _site_name(_first(row, _URL_COLUMNS), _first(row, _NAME_COLUMNS))
+            yield site, {"username": _first(row, _USERNAME_COLUMNS), "password": _first(row, _PASSWORD_COLUMNS)}
+
+
+class _JsonStream:
+    """Just enough of an incremental JSON reader to walk one top-level array
+    without loading the file."""
+
+    def __init__(self, f, chunk_size: int = 1 << 16):
+        self._f = f
+        self._chunk_size = chunk_size
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+        self._decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        data = self._f.read(self._chunk_size)
+        if not data:
+            self._eof = True
+            return False
+        self._buf = self._buf[self._pos:] + data
+        self._pos = 0
+        return True
+
+    def peek(self) -> str:
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in " \t\r\n":
+                self._pos += 1
+            if self._pos < len(self._buf) or not self._fill():
+                return self._buf[self._pos:self._pos + 1]
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise TransferError(f"Malformed JSON: expected '{char}'.")
+        self._pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                obj, end = self._decoder.raw_decode(self._buf, self._pos)
+                # A number cut by the chunk boundary still decodes; wait for
+                # the character after it unless the file has ended
+                if end < len(self._buf) or self._eof:
+                    self._pos = end
+                    return obj
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise TransferError("Malformed JSON.") from None
+            self._fill()
+
+    def iter_array(self) -> Iterator:
+        self.expect("[")
+        if self.peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.peek() == "]":
+                self._pos += 1
+                return
+            self.expect(",")
+
+def read_bitwarden_json(path: str) -> Iterator[tuple[str, dict]]:
+    with open(path, encoding="utf-8-sig") as f:
+        stream = _JsonStream(f)
+        stream.expect("{")
+        while stream.peek() not in ("}", ""):
+            key = stream.value()
+            stream.expect(":")
+            if key != "items":
+                if key == "encrypted" and stream.value():
+                    raise TransferError("Encrypted Bitwarden exports are not supported; export as unencrypted JSON.")
+                elif key != "encrypted":
+                    stream.value()  # folders, collections
+            else:
+                for item in stream.iter_array():
+                    login = item.get("login")
+                    if not login:
+                        continue  # secure notes, cards, identities
+                    uris = login.get("uris") or [{}]
+                    site = _site_name(uris[0].get("uri") or "", item.get("name") or "")
+                    yield site, {"username": login.get("username") or "", "password": login.get("password") or ""}
+            if stream.peek() == ",":
+                stream.expect(",")
+
+def _read_export_header(f) -> dict:
+    try:
+        header = json.loads(f.readline())
+    except json.JSONDecodeError:
+        header = None
+    if not isinstance(header, dict) or header.get("format") != EXPORT_FORMAT:
+        raise TransferError("Not a VaultSafe export file.")
+    if header.get("version") != EXPORT_VERSION:
+        raise TransferError(f"Unsupported VaultSafe export version {header.get('version')}.")
+    return header
+
+def detect_format(path: str) -> str:
+    with open(path, encoding="utf-8-sig") as f:
+        first = f.readline()
+    try:
+        if json.loads(first).get("format") == EXPORT_FORMAT:
+            return EXPORT_FORMAT
+    except (json.JSONDecodeError, AttributeError):
+        pass
+    return "bitwarden-json" if first.lstrip().startswith("{") else "csv"
+
+
+# === Batched parallel pipeline ===
+
+def _encrypt_row(master_password: str, vault_salt: bytes | None, vault_key: bytes | None,
+                 kdf: dict | None, blind_index: bool, data: dict) -> dict:
+    return encrypt_record(master_password, data, vault_salt, vault_key, kdf, blind_index=blind_index)
+
+def _decrypt_row(master_password: str, vault_keys: dict[str, bytes], record: dict) -> dict:
+    return decrypt_record_strict(master_password, record, vault_keys)
+
+def _batches(items: Iterable[tuple[str, object]], fn: Callable, batch_size: int,
+             max_workers: int) -> Iterator[list[tuple[str, object]]]:
+    """Map fn over item values, yielding results a batch at a time in input order.
+
+    With workers, the next batch is already submitted while the caller
+    commits the current one.
+    """
+    items = iter(items)
+    if max_workers == 0:
+        while batch := list(itertools.islice(items, batch_size)):
+            yield [(site, _call(fn, site, value)) for site, value in batch]
+        return
+
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        try:
+            pending = None
+            while True:
+                batch = list(itertools.islice(items, batch_size))
+                submitted = [(site, pool.submit(fn, value)) for site, value in batch]
+                if pending:
+                    yield [(site, _call(future.result, site)) for site, future in pending]
+                if not submitted:
+                    return
+                pending = submitted
+        except BaseException:
+            pool.shutdown(cancel_futures=True)
+            raise
+
+def _call(fn: Callable, site: str, *args):
+    try:
+        return fn(*args)
+    except DecryptionError:
+        raise TransferError(f"Entry '{site}' did not decrypt with the given password.") from None
+
+def _workers(max_workers: int | None, vault_key: bytes | None) -> int:
+    if vault_key is not None:
+        return 0  # per-entry work is an HKDF and one AES-GCM call
+    return max_workers or os.cpu_count() or 1
+
+def _import(items: Iterable[tuple[str, object]], fn: Callable, overwrite: bool, batch_size: int,
+            max_workers: int, on_progress: Callable[[int, int], None] | None) -> dict:
+    existing = set(vault_io.load_vault())
+    taken: set[str] = set()
+    counts = {"imported": 0, "skipped": 0}
+
+    def accepted():
+        for site, value in items:
+            if not site or value is None:
+                counts["skipped"] += 1
+                continue
+            # Several logins for one site: github.com, github.com (2), ...
+            name = vault_io.free_account_key(site, taken)
+            taken.add(name)
+            if name in existing and not overwrite:
+                counts["skipped"] += 1
+                continue
+            yield name, value
+
+    for batch in _batches(accepted(), fn, batch_size, max_workers):
+        # Entries about to be overwritten keep their current record as a revision
+        replaced = {name: vault_io.get_entry(name) for name, _ in batch if name in existing}
+        replaced = {name: record for name, record in replaced.items() if record is not None}
+        if replaced:
+            history.save_records(replaced)
+        vault_io.put_entries(dict(batch))
+        counts["imported"] += len(batch)
+        if on_progress:
+            on_progress(counts["imported"], counts["skipped"])
+    return counts
+
+def _vault_key(master_password: str) -> tuple[bytes | None, bytes | None, dict | None, bool]:
+    settings = vault_io.entry_settings()
+    vault_salt, kdf = settings["vault_salt"], settings["kdf"]
+    vault_key = derive_key(master_password, vault_salt, kdf) if vault_salt else None
+    return vault_salt, vault_key, kdf, settings["blind_index"]
+
+
+# === Import ===
+
+def import_entries(rows: Iterable[tuple[str, dict]], master_password: str, overwrite: bool = False,
+                   batch_size: int = BATCH_SIZE, max_workers: int | None = None,
+                   on_progress: Callable[[int, int], None] | None = None) -> dict:
+    """Encrypt and store (site, {"username", "password"}) rows.
+
+    Rows without a site or password are skipped, as are sites already in
+    the vault unless overwrite is set. Every committed batch is atomic; an
+    interrupted import keeps the batches before it. Returns
+    {"imported": n, "skipped": n}.
+    """
+    vault_salt, vault_key, kdf, blind_index = _vault_key(master_password)
+    fn = partial(_encrypt_row, master_password, vault_salt, vault_key, kdf, blind_index)
+    rows = ((site, data if data.get("password") else None) for site, data in rows)
+    return _import(rows, fn, overwrite, batch_size, _workers(max_workers, vault_key), on_progress)
+
+def import_file(path: str, master_password: str, fmt: str | None = None,
+                export_password: str | None = None, **options) -> dict:
+    fmt = fmt or detect_format(path)
+    if fmt == "csv":
+        return import_entries(read_csv(path), master_password, **options)
+    if fmt == "bitwarden-json":
+        return import_entries(read_bitwarden_json(path), master_password, **options)
+    if fmt == EXPORT_FORMAT:
+        if not export_password:
+            raise TransferError("A VaultSafe export needs its export password.")
+        return _import_export(path, master_password, export_password, **options)
+    raise TransferError(f"Unknown import format '{fmt}'.")
+
+def _import_export(path: str, master_password: str, export_password: str, overwrite: bool = False,
+                   batch_size: int = BATCH_SIZE, max_workers: int | None = None,
+                   on_progress: Callable[[int, int], None] | None = None) -> dict:
+    with open(path, encoding="utf-8") as f:
+        header = _read_export_header(f)
+        export_keys = {vault_key_id(header): derive_key(export_password, base64.b64decode(header["vs"]), header.get("kdf"))}
+        vault_salt, vault_key, kdf, blind_index = _vault_key(master_password)
+        fn = partial(records.reencrypt_record, export_password, export_keys,
+                     master_password, vault_salt, vault_key, kdf, blind_index=blind_index)
+        lines = (json.loads(line) for line in f if line.strip())
+        items = ((line["site"], line["record"]) for line in lines)
+        try:
+            return _import(items, fn, overwrite, batch_size, _workers(max_workers, vault_key), on_progress)
+        except TransferError:
+            raise TransferError("Export password is wrong or the export is damaged; "
+                                "batches before the failure were kept.") from None
+
+
+# === Export ===
+
+def export_vault(path: str, master_password: str, fmt: str = EXPORT_FORMAT,
+                 export_password: str | None = None, batch_size: int = BATCH_SIZE,
+                 max_workers: int | None = None,
+                 on_progress: Callable[[int, int], None] | None = None) -> int:
+    """Write every entry to path, a batch at a time.
+
+    EXPORT_FORMAT re-encrypts entries under export_password (one vault key
+    for the whole file) and never holds plaintext beyond one batch. "csv"
+    writes plaintext site,username,password rows for other managers; the
+    file is created 0600. Either way the file only appears once complete.
+    Returns the number of entries written.
+    """
+    if fmt not in ("csv", EXPORT_FORMAT):
+        raise TransferError(f"Unknown export format '{fmt}'.")
+    if fmt == EXPORT_FORMAT and not export_password:
+        raise TransferError("An encrypted export needs an export password.")
+
+    vault = vault_io.load_vault()
+    vault_keys = records.vault_keys(master_password, vault)
+    items = ((site, vault[site]) for site in sorted(vault))
+    # Only format v1 entries need a slow KDF each; everything else is cheap
+    workers = 0 if all(map(is_v2_record, vault.values())) else max_workers or os.cpu_count() or 1
+
+    tmp_path = path + ".tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    done = 0
+    try:
+        with open(fd, "w", newline="", encoding="utf-8") as f:
+            if fmt == "csv":
+                writer = csv.writer(f)
+                writer.writerow(("site", "username", "password"))
+                fn = partial(_decrypt_row, master_password, vault_keys)
+            else:
+                kdf = vault_io.load_meta().get("kdf")
+                export_salt = os.urandom(SALT_LENGTH)
+                export_key = derive_key(export_password, export_salt, kdf)
+                header = {"format": EXPORT_FORMAT, "version": EXPORT_VERSION,
+                          "vs": base64.b64encode(export_salt).decode(), "kdf": kdf}
+                f.write(json.dumps(header) + "\n")
+                fn = partial(records.reencrypt_record, master_password, vault_keys,
+                             export_password, export_salt, export_key, kdf)
+
+            for batch in _batches(items, fn, batch_size, workers):
+                for site, result in batch:
+                    if fmt == "csv":
+                        writer.writerow((site, result.get("username", ""), result.get("password", "")))
+                    else:
+                        f.write(json.dumps({"site": site, "record": result}) + "\n")
+                done += len(batch)
+                if on_progress:
+                    on_progress(done, len(vault))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return done
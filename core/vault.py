@@ -0,0 +1,131 @@
+import os
+import threading
+from typing import Callable
+
+from core import vault_io
+
+# Listeners get the set of sites that changed, or None after a full reload
+Listener = Callable[[set[str] | None], None]
+
+
+class Vault:
+    """In-memory repository over core.vault_io.
+
+    The vault files are parsed once and reads are served from memory.
+    refresh() revalidates with a stat() of the vault files (inode, size,
+    mtime) and only re-parses when another writer touched them. Writes go
+    through put()/delete() so the cache and listeners stay current.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._records: dict = {}
+        self._signature = None
+        self._listeners: list[Listener] = []
+
+    def _stat_signature(self) -> tuple:
+        signature = []
+        for path in vault_io.vault_paths():
+            try:
+                st = os.stat(path)
+                signature.append((st.st_ino, st.st_size, st.st_mtime_ns))
+            except FileNotFoundError:
+                signature.append(None)
+        return tuple(signature)
+
+    def refresh(self) -> bool:
+        with self._lock:
+            signature = self._stat_signature()
+            if signature == self._signature:
+                return False
+            self._records = vault_io.load_vault()
+            self._signature = signature
+        self._notify(None)
+        return True
+
+    def _ensure_loaded(self) -> None:
+        if self._signature is None:
+            self.refresh()
+
+    def subscribe(self, listener: Listener) -> None:
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener: Listener) -> None:
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _notify(self, sites: set[str] | None) -> None:
+        for listener in list(self._listeners):
+            listener(sites)
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._ensure_loaded()
+            return len(self._records)
+
+    def __contains__(self, site: str) -> bool:
+        with self._lock:
+            self._ensure_loaded()
+            return site in self._records
+
+    def get(self, site: str) -> dict | None:
+        with self._lock:
+            self._ensure_loaded()
+            record = self._records.get(site)
+            return dict(record) if record is not None else None
+
+    def sites(self) -> list[str]:
+        with self._lock:
+            self._ensure_loaded()
+            return list(self._records)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            self._ensure_loaded()
+            return {site: dict(record) for site, record in self._records.items()}
+
+    def put(self, site: str, record: dict, expected_rev: int | None = None) -> None:
+        # expected_rev: see vault_io.put_entry
+        with self._lock:
+            self._ensure_loaded()
+            try:
+                rev = vault_io.put_entry(site, record, expected_rev)
+            except vault_io.VersionConflict:
+                self._signature = None  # another process wrote; reload on next refresh()
+                raise
+            self._records[site] = {**record, "rev": rev}
+            self._signature = self._stat_signature()
+        self._notify({site})
+
+    def add(self, site: str, record: dict) -> str:
+        # New account for site; returns the entry name it was stored under
+        with self._lock:
+            self._ensure_loaded()
+            key = vault_io.add_entry(site, record)
+            self._records[key] = {**record, "rev": 1}
+            self._signature = self._stat_signature()
+        self._notify({key})
+        return key
+
+    def delete(self, site: str, expected_rev: int | None = None) -> None:
+        with self._lock:
+            self._ensure_loaded()
+            try:
+                vault_io.delete_entry(site, expected_rev)
+            except vault_io.VersionConflict:
+                self._signature = None
+                raise
+            self._records.pop(site, None)
+            self._signature = self._stat_signature()
+        self._notify({site})
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+def shared_vault() -> Vault:
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = Vault()
+        return _shared
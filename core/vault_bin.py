@@ -0,0 +1,227 @@
+import os
+import json
+import mmap
+import base64
+import struct
+import hashlib
+
+from core.vault_io import load_vault, save_vault, compact_vault
+
+# Binary vault container
+#
+#   header  : magic, version, flags, entry count
+#   index   : `count` fixed-size slots sorted by (site hash, site)
+#   records : site name, salt, iv, ciphertext, extra — raw bytes, no base64
+#
+# "extra" holds any record fields other than salt/iv/ciphertext (as JSON) so
+# conversion to and from vault.json is lossless.
+MAGIC = b"VSVB"
+FORMAT_VERSION = 1
+
+_HEADER = struct.Struct("<4sHHI")        # magic, version, flags, count
+_SLOT = struct.Struct("<QQHBBII")        # hash, offset, site, salt, iv, ct, extra lengths
+_RAW_FIELDS = ("salt", "iv", "ciphertext")
+_ABSENT = "__absent__"                   # raw fields the source record lacked
+
+
+class BinaryVaultError(Exception):
+    pass
+
+
+def _site_hash(site: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(site, digest_size=8).digest(), "little")
+
+def _b64_canonical(value) -> bytes | None:
+    # None unless value round-trips exactly; anything else is kept verbatim
+    if not isinstance(value, str):
+        return None
+    try:
+        decoded = base64.b64decode(value, validate=True)
+    except ValueError:
+        return None
+    return decoded if base64.b64encode(decoded).decode() == value else None
+
+def _split_record(record: dict) -> tuple[list[bytes], dict]:
+    raw, extra = [], dict(record)
+    for field in _RAW_FIELDS:
+        if field not in extra:
+            extra.setdefault(_ABSENT, []).append(field)
+            raw.append(b"")
+            continue
+        decoded = _b64_canonical(extra[field])
+        if decoded is not None:
+            del extra[field]
+            raw.append(decoded)
+        else:
+            raw.append(b"")
+    return raw, extra
+
+
+def write_binary_vault(vault: dict, path: str) -> None:
+    slots, chunks = [], []
+    offset = _HEADER.size + _SLOT.size * len(vault)
+
+    for site, record in vault.items():
+        site_bytes = site.encode()
+        (salt, iv, ciphertext), extra = _split_record(record)
+        extra_bytes = json.dumps(extra, separators=(",", ":")).encode() if extra else b""
+        if len(site_bytes) > 0xFFFF or len(salt) > 0xFF or len(iv) > 0xFF:
+            raise BinaryVaultError(f"Entry '{site}' does not fit the binary format.")
+        slots.append((_site_hash(site_bytes), site_bytes, offset,
+                      len(salt), len(iv), len(ciphertext), len(extra_bytes)))
+        chunk = site_bytes + salt + iv + ciphertext + extra_bytes
+        chunks.append(chunk)
+        offset += len(chunk)
+
+    slots.sort(key=lambda slot: (slot[0], slot[1]))
+    parts = [_HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(vault))]
+    for h, site_bytes, off, salt_len, iv_len, ct_len, extra_len in slots:
+        parts.append(_SLOT.pack(h, off, len(site_bytes), salt_len, iv_len, ct_len, extra_len))
+    parts.extend(chunks)
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(b"".join(parts))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class BinaryVault:
+    """Read-only, memory-mapped view of a binary vault file.
+
+    Looking up a site touches only the index slots visited by the binary
+    search and that site's record; nothing else is parsed.
+    """
+
+    def __init__(self, path: str):
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise BinaryVaultError("Not a VaultSafe binary vault.") from None
+        if len(self._map) < _HEADER.size:
+            self.close()
+            raise BinaryVaultError("Not a VaultSafe binary vault.")
+        magic, version, _, count = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self.close()
+            raise BinaryVaultError("Not a VaultSafe binary vault.")
+        if version != FORMAT_VERSION:
+            self.close()
+            raise BinaryVaultError(f"Unsupported binary vault version {version}.")
+        # Every offset read later is checked against the file, so a damaged
+        # file raises BinaryVaultError instead of yielding garbage records
+        self._data_start = _HEADER.size + count * _SLOT.size
+        if self._data_start > len(self._map):
+            self.close()
+            raise BinaryVaultError(f"Binary vault is truncated: the header lists {count} entries.")
+        self._count = count
+
+    def close(self) -> None:
+        if getattr(self, "_map", None) is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, site: str) -> bool:
+        return self._find(site) is not None
+
+    def _slot(self, i: int) -> tuple:
+        slot = _SLOT.unpack_from(self._map, _HEADER.size + i * _SLOT.size)
+        _, offset, *lengths = slot
+        if offset < self._data_start or offset + sum(lengths) > len(self._map):
+            raise BinaryVaultError(f"Binary vault is corrupt: entry {i} lies outside the file.")
+        return slot
+
+    def _site_at(self, slot: tuple) -> bytes:
+        _, offset, site_len, *_ = slot
+        return self._map[offset:offset + site_len]
+
+    def _find(self, site: str) -> tuple | None:
+        site_bytes = site.encode()
+        target = (_site_hash(site_bytes), site_bytes)
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            slot = self._slot(mid)
+            if (slot[0], self._site_at(slot)) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self._count:
+            slot = self._slot(lo)
+            if slot[0] == target[0] and self._site_at(slot) == site_bytes:
+                return slot
+        return None
+
+    def _fields(self, slot: tuple) -> tuple[bytes, bytes, bytes, dict]:
+        _, offset, site_len, salt_len, iv_len, ct_len, extra_len = slot
+        pos = offset + site_len
+        salt = self._map[pos:pos + salt_len]
+        pos += salt_len
+        iv = self._map[pos:pos + iv_len]
+        pos += iv_len
+        ciphertext = self._map[pos:pos + ct_len]
+        pos += ct_len
+        try:
+            extra = json.loads(self._map[pos:pos + extra_len]) if extra_len else {}
+        except ValueError:
+            raise BinaryVaultError("Binary vault is corrupt: an entry's extra fields are unreadable.") from None
+        return salt, iv, ciphertext, extra
+
+    def get(self, site: str) -> dict | None:
+        # Record in the vault.json layout, "v", "vs" and "kdf" included, so
+        # it goes to crypto.decrypt_record like any other
+        slot = self._find(site)
+        if slot is None:
+            return None
+        return self._record(slot)
+
+    def _record(self, slot: tuple) -> dict:
+        salt, iv, ciphertext, extra = self._fields(slot)
+        absent = extra.pop(_ABSENT, [])
+        record = {}
+        for field, value in zip(_RAW_FIELDS, (salt, iv, ciphertext)):
+            if field not in extra and field not in absent:
+                record[field] = base64.b64encode(value).decode()
+        record.update(extra)
+        return record
+
+    def _slots_in_file_order(self) -> list[tuple]:
+        return sorted((self._slot(i) for i in range(self._count)), key=lambda slot: slot[1])
+
+    def sites(self) -> list[str]:
+        return [self._site_at(slot).decode() for slot in self._slots_in_file_order()]
+
+    def to_dict(self) -> dict:
+        return {self._site_at(slot).decode(): self._record(slot)
+                for slot in self._slots_in_file_order()}
+
+
+def json_to_binary(bin_path: str) -> int:
+    vault = load_vault()
+    write_binary_vault(vault, bin_path)
+    return len(vault)
+
+def binary_to_json(bin_path: str) -> int:
+    # Only into an empty vault: entries missing from the file would
+    # otherwise be deleted
+    if load_vault():
+        raise BinaryVaultError("The vault already holds entries; convert into an empty vault.")
+    with BinaryVault(bin_path) as bv:
+        vault = bv.to_dict()
+    # base={}: an entry written meanwhile fails the save instead of being lost
+    save_vault(vault, base={})
+    compact_vault()
+    return len(vault)
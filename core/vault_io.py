@@ -1,18 +1,574 @@
 import os
+import re
 import json
+import base64
+import hashlib
+import threading
+from contextlib import contextmanager
+from typing import Callable
 
-VAULT_FILE = "vault.json"
+try:
+    import fcntl
+except ImportError:          # Windows
+    fcntl = None
+    import msvcrt
 
-def load_vault() -> dict:
-    if not os.path.exists(VAULT_FILE):
-        return {}
+from core.instrument import span
+
+VAULT_FILE = os.environ.get("VAULTSAFE_VAULT", "vault.json")
+
+# Storage is pluggable: the functions at the bottom of this module are the
+# API the rest of the app uses, and they forward to the backend chosen by
+# VAULT_FILE's suffix (see register_backend). vault.json and anything else
+# without a registered suffix uses JsonLogBackend below; .db/.sqlite files
+# use core.sqlite_store.
+#
+# Entries are keyed by name. A site's first account is stored under the
+# site itself, further ones under "site (2)", "site (3)", ... (account_key).
+
+# The JSON vault is a compacted snapshot (VAULT_FILE, same layout as always)
+# plus an append-only log of mutations (VAULT_FILE + ".log"). The log's first
+# line names the digest of the snapshot it applies to, so a log left behind
+# by an interrupted compaction is recognised as stale and ignored.
+COMPACT_DEAD_RATIO = 0.5     # compact once half the stored records are dead
+COMPACT_MIN_RECORDS = 32     # ...but never bother for tiny vaults
+
+# Several processes (GUI, CLI, scripts) may share these files. Readers hold
+# a shared flock on VAULT_FILE + ".lock" and writers an exclusive one, so
+# readers never block each other and a writer always sees the latest log.
+# Each process keeps its replayed copy and, under the lock, catches up on
+# only the log lines others appended since (_sync). Every record carries a
+# "rev" counter bumped on each write; writers that pass the rev they read
+# get VersionConflict instead of overwriting someone else's change.
+
+_ACCOUNT_SUFFIX = re.compile(r" \((\d+)\)$")
+
+
+class VersionConflict(Exception):
+    """A conditional write found the entry at another revision than expected."""
+
+    def __init__(self, site: str, expected: int, actual: int):
+        if expected == 0:
+            message = f"An entry for '{site}' already exists."
+        elif actual == 0:
+            message = f"Entry '{site}' was deleted by another writer."
+        else:
+            message = f"Entry '{site}' was changed by another writer since it was read."
+        super().__init__(message)
+        self.site = site
+        self.expected = expected
+        self.actual = actual
+
+
+def record_rev(record: dict | None) -> int:
+    # 0 for a missing entry; entries written before revs existed count as 1
+    if record is None:
+        return 0
+    return record.get("rev", 1)
+
+def account_key(site: str, n: int) -> str:
+    # Entry name of a site's n-th account (1-based)
+    return site if n == 1 else f"{site} ({n})"
+
+def entry_site(key: str) -> str:
+    # "github.com (2)" -> "github.com"
+    return _ACCOUNT_SUFFIX.sub("", key)
+
+def free_account_key(site: str, taken) -> str:
+    # First account_key of site not in taken
+    n = 1
+    while account_key(site, n) in taken:
+        n += 1
+    return account_key(site, n)
+
+def _same(a: dict | None, b: dict) -> bool:
+    # Equal apart from "rev", which callers may not have
+    return a == b or (a is not None and {**a, "rev": 0} == {**b, "rev": 0})
+
+def _check_rev(live: dict, site: str, expected_rev: int | None) -> int:
+    actual = record_rev(live.get(site))
+    if expected_rev is not None and expected_rev != actual:
+        raise VersionConflict(site, expected_rev, actual)
+    return actual
+
+
+class VaultBackend:
+    """Storage interface behind the module-level functions.
+
+    Records are plain dicts as produced by crypto.encrypt_record; backends
+    store them verbatim apart from maintaining "rev". load() must return a
+    fresh dict the caller may modify.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def paths(self) -> tuple[str, ...]:
+        # Every file whose change means the vault changed
+        raise NotImplementedError
+
+    def load(self) -> dict:
+        raise NotImplementedError
+
+    def get(self, site: str) -> dict | None:
+        return self.load().get(site)
+
+    def accounts(self, site: str) -> list[str]:
+        return [key for key in self.load() if entry_site(key) == site]
+
+    def save(self, vault: dict, base: dict | None = None) -> None:
+        raise NotImplementedError
+
+    def put(self, site: str, record: dict, expected_rev: int | None = None) -> int:
+        raise NotImplementedError
+
+    def put_many(self, records: dict) -> None:
+        raise NotImplementedError
+
+    def add(self, site: str, record: dict) -> str:
+        raise NotImplementedError
+
+    def delete(self, site: str, expected_rev: int | None = None) -> None:
+        raise NotImplementedError
+
+    def compact(self) -> None:
+        pass
+
+    def load_meta(self) -> dict:
+        raise NotImplementedError
+
+    def save_meta(self, meta: dict) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+# === JSON snapshot + append-only log ===
+
+def _digest(raw: bytes) -> str:
+    return hashlib.sha256(raw).hexdigest()
+
+def _encode(op: dict) -> bytes:
+    return (json.dumps(op, separators=(",", ":")) + "\n").encode()
+
+def _decode(line: bytes) -> dict | None:
+    if not line.endswith(b"\n"):
+        return None
+    try:
+        return json.loads(line)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None
+
+def _stat_key(st: os.stat_result) -> tuple:
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+def _path_stat(path: str) -> tuple | None:
     try:
-        with open(VAULT_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except (json.JSONDecodeError, IOError):
-        # Vault corrupted or unreadable
-        return {}
-
-def save_vault(vault: dict) -> None:
-    with open(VAULT_FILE, "w", encoding="utf-8") as f:
-        json.dump(vault, f, indent=2)
+        return _stat_key(os.stat(path))
+    except FileNotFoundError:
+        return None
+
+def _atomic_write(path: str, raw: bytes) -> tuple:
+    # Write-then-rename so a crash never leaves a half-written file.
+    # Returns the new file's stat key.
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(raw)
+        f.flush()
+        os.fsync(f.fileno())
+        st = os.fstat(f.fileno())
+    os.replace(tmp_path, path)
+    return _stat_key(st)
+
+def _flock(f, exclusive: bool) -> None:
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        return
+    # msvcrt only has exclusive locks, so on Windows readers take turns too.
+    # LK_LOCK gives up after about 10 seconds; keep waiting.
+    f.seek(0)
+    while True:
+        try:
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            pass
+
+def _funlock(f) -> None:
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+def _apply(vault: dict, op: dict) -> int:
+    kind = op.get("op")
+    if kind == "put":
+        vault[op["site"]] = op["record"]
+        return 1
+    if kind == "del":
+        vault.pop(op["site"], None)
+        return 1
+    if kind == "batch":
+        vault.update(op["put"])
+        for site in op["del"]:
+            vault.pop(site, None)
+        return len(op["put"]) + len(op["del"])
+    return 0
+
+
+class JsonLogBackend(VaultBackend):
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._lock = threading.RLock()
+        self._lock_mode = None       # file lock held by the thread owning _lock
+        self._live = None            # replayed vault as of the last load or append
+        self._snapshot_digest = ""
+        self._snapshot_stat = None   # (inode, size, mtime) of the snapshot _live came from
+        self._log_inode = None
+        self._log_ok = False         # log exists and belongs to the current snapshot
+        self._log_end = 0            # byte offset just past the last intact log line
+        self._record_count = 0       # records on disk (snapshot + log), live or dead
+
+    def _log_path(self) -> str:
+        return self.path + ".log"
+
+    def _meta_path(self) -> str:
+        return self.path + ".meta"
+
+    def _lock_path(self) -> str:
+        return self.path + ".lock"
+
+    def paths(self) -> tuple[str, ...]:
+        return self.path, self._log_path(), self._meta_path()
+
+    @contextmanager
+    def _locked(self, exclusive: bool):
+        # _lock serialises threads; the file lock serialises processes. Nested
+        # calls reuse the outer lock (a shared lock cannot be upgraded).
+        with self._lock:
+            if self._lock_mode == "ex" or (self._lock_mode == "sh" and not exclusive):
+                yield
+                return
+            if self._lock_mode == "sh":
+                raise RuntimeError("Cannot upgrade a shared vault lock.")
+            try:
+                f = open(self._lock_path(), "a+b")
+            except OSError:
+                if exclusive:
+                    raise
+                # e.g. a read-only directory: read unlocked
+                yield
+                return
+            try:
+                _flock(f, exclusive)
+                self._lock_mode = "ex" if exclusive else "sh"
+                try:
+                    yield
+                finally:
+                    self._lock_mode = None
+                    _funlock(f)
+            finally:
+                f.close()
+
+    def _read_snapshot(self) -> tuple[dict, str, int, tuple | None]:
+        try:
+            with open(self.path, "rb") as f:
+                raw = f.read()
+                st = _stat_key(os.fstat(f.fileno()))
+        except FileNotFoundError:
+            return {}, "", 0, None
+        except IOError:
+            # Vault unreadable
+            return {}, "", 0, None
+        try:
+            return json.loads(raw), _digest(raw), len(raw), st
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            # Vault corrupted
+            return {}, _digest(raw), len(raw), st
+
+    def _load(self) -> int:
+        # Returns the number of bytes read
+        vault, digest, size, snapshot_stat = self._read_snapshot()
+        count = len(vault)
+        log_ok, log_end, log_inode = False, 0, None
+
+        try:
+            with open(self._log_path(), "rb") as f:
+                log_inode = os.fstat(f.fileno()).st_ino
+                header = _decode(f.readline())
+                if header is not None and header.get("base") == digest:
+                    log_ok, log_end = True, f.tell()
+                    for line in f:
+                        op = _decode(line)
+                        if op is None:
+                            break  # torn tail from a crash mid-append
+                        count += _apply(vault, op)
+                        log_end += len(line)
+        except FileNotFoundError:
+            pass
+
+        self._live = vault
+        self._snapshot_digest, self._snapshot_stat = digest, snapshot_stat
+        self._log_ok, self._log_end, self._log_inode = log_ok, log_end, log_inode
+        self._record_count = count
+        return size + log_end
+
+    def _sync(self) -> int:
+        # Bring _live up to date with the files; returns the bytes read. Only
+        # log lines appended since the last call are replayed; the snapshot is
+        # re-read only when it was replaced (a compaction).
+        if self._live is None or _path_stat(self.path) != self._snapshot_stat:
+            return self._load()
+        try:
+            f = open(self._log_path(), "rb")
+        except FileNotFoundError:
+            return self._load() if self._log_inode is not None else 0
+        with f:
+            st = os.fstat(f.fileno())
+            if st.st_ino != self._log_inode or st.st_size < self._log_end:
+                return self._load()
+            if not self._log_ok or st.st_size == self._log_end:
+                return 0
+            f.seek(self._log_end)
+            read = 0
+            for line in f:
+                op = _decode(line)
+                if op is None:
+                    break
+                self._record_count += _apply(self._live, op)
+                self._log_end += len(line)
+                read += len(line)
+            return read
+
+    def _append(self, op: dict) -> int:
+        # Returns the number of bytes written. Caller holds the exclusive lock
+        # and has just run _sync().
+        written = 0
+        if not self._log_ok:
+            header = _encode({"base": self._snapshot_digest})
+            self._log_inode = _atomic_write(self._log_path(), header)[0]
+            self._log_ok, self._log_end = True, len(header)
+            written += len(header)
+
+        line = _encode(op)
+        with open(self._log_path(), "r+b") as f:
+            f.seek(self._log_end)
+            f.write(line)
+            f.truncate()  # drop any torn tail left by an earlier crash
+            f.flush()
+            os.fsync(f.fileno())
+        self._log_end += len(line)
+        self._record_count += _apply(self._live, op)
+        self._maybe_compact()
+        return written + len(line)
+
+    def _maybe_compact(self) -> None:
+        # Runs in the writer, still under its exclusive lock: a background
+        # thread would die with short-lived CLI processes and leave the log
+        # growing. The snapshot rewrite is O(n) but only follows O(n) dead
+        # records, so it stays amortised O(1) per write.
+        if self._record_count < COMPACT_MIN_RECORDS:
+            return
+        dead = self._record_count - len(self._live)
+        if dead / self._record_count < COMPACT_DEAD_RATIO:
+            return
+        try:
+            self.compact()
+        except OSError:
+            pass  # the write itself is durable; retried on the next trigger
+
+    def compact(self) -> None:
+        with self._locked(exclusive=True), span("io.compact_vault") as sp:
+            self._sync()
+            raw = json.dumps(self._live, indent=2).encode()
+            digest = _digest(raw)
+            header = _encode({"base": digest})
+            # Snapshot first: if we die before the log is reset, the old log no
+            # longer matches the snapshot digest and is skipped on replay.
+            self._snapshot_stat = _atomic_write(self.path, raw)
+            self._log_inode = _atomic_write(self._log_path(), header)[0]
+            self._snapshot_digest = digest
+            self._log_ok, self._log_end = True, len(header)
+            self._record_count = len(self._live)
+            sp.bytes_written = len(raw) + len(header)
+            sp.entries = len(self._live)
+
+    def load(self) -> dict:
+        with self._locked(exclusive=False), span("io.load_vault") as sp:
+            sp.bytes_read = self._sync()
+            sp.entries = len(self._live)
+            return {site: dict(record) for site, record in self._live.items()}
+
+    def get(self, site: str) -> dict | None:
+        with self._locked(exclusive=False), span("io.get_entry") as sp:
+            sp.bytes_read = self._sync()
+            record = self._live.get(site)
+            return dict(record) if record is not None else None
+
+    def accounts(self, site: str) -> list[str]:
+        with self._locked(exclusive=False):
+            self._sync()
+            return [key for key in self._live if entry_site(key) == site]
+
+    def save(self, vault: dict, base: dict | None = None) -> None:
+        with self._locked(exclusive=True), span("io.save_vault") as sp:
+            self._sync()
+            live = self._live
+            if base is not None:
+                for site in base.keys() | live.keys():
+                    _check_rev(live, site, record_rev(base.get(site)))
+            puts = {site: {**record, "rev": record_rev(live.get(site)) + 1}
+                    for site, record in vault.items() if not _same(live.get(site), record)}
+            dels = [site for site in live if site not in vault]
+            if puts or dels:
+                sp.bytes_written = self._append({"op": "batch", "put": puts, "del": dels})
+            sp.entries = len(puts) + len(dels)
+
+    def put(self, site: str, record: dict, expected_rev: int | None = None) -> int:
+        with self._locked(exclusive=True), span("io.put_entry") as sp:
+            self._sync()
+            rev = _check_rev(self._live, site, expected_rev) + 1
+            sp.bytes_written = self._append({"op": "put", "site": site, "record": {**record, "rev": rev}})
+            sp.entries = 1
+            return rev
+
+    def put_many(self, records: dict) -> None:
+        with self._locked(exclusive=True), span("io.put_entries") as sp:
+            self._sync()
+            if records:
+                records = {site: {**record, "rev": record_rev(self._live.get(site)) + 1}
+                           for site, record in records.items()}
+                sp.bytes_written = self._append({"op": "batch", "put": records, "del": []})
+            sp.entries = len(records)
+
+    def add(self, site: str, record: dict) -> str:
+        with self._locked(exclusive=True), span("io.add_entry") as sp:
+            self._sync()
+            key = free_account_key(site, self._live)
+            sp.bytes_written = self._append({"op": "put", "site": key, "record": {**record, "rev": 1}})
+            sp.entries = 1
+            return key
+
+    def delete(self, site: str, expected_rev: int | None = None) -> None:
+        with self._locked(exclusive=True), span("io.delete_entry") as sp:
+            self._sync()
+            _check_rev(self._live, site, expected_rev)
+            if site in self._live:
+                sp.bytes_written = self._append({"op": "del", "site": site})
+                sp.entries = 1
+
+    def load_meta(self) -> dict:
+        try:
+            with open(self._meta_path(), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def save_meta(self, meta: dict) -> None:
+        with self._locked(exclusive=True):
+            _atomic_write(self._meta_path(), json.dumps(meta, indent=2).encode())
+
+
+# === Backend selection ===
+
+def _open_sqlite(path: str) -> VaultBackend:
+    from core.sqlite_store import SqliteBackend
+    return SqliteBackend(path)
+
+_factories: dict[str, Callable[[str], VaultBackend]] = {
+    ".db": _open_sqlite,
+    ".sqlite": _open_sqlite,
+    ".sqlite3": _open_sqlite,
+}
+_backends: dict[str, VaultBackend] = {}
+_backends_lock = threading.Lock()
+
+def register_backend(suffix: str, factory: Callable[[str], VaultBackend]) -> None:
+    # factory(path) is called once per vault path ending in suffix
+    _factories[suffix.lower()] = factory
+
+def open_backend(path: str) -> VaultBackend:
+    # One shared backend per path, so in-process state and locks are shared
+    with _backends_lock:
+        store = _backends.get(path)
+        if store is None:
+            factory = _factories.get(os.path.splitext(path)[1].lower(), JsonLogBackend)
+            store = _backends[path] = factory(path)
+        return store
+
+def backend() -> VaultBackend:
+    return open_backend(VAULT_FILE)
+
+
+# === Vault API ===
+
+def vault_paths() -> tuple[str, ...]:
+    return backend().paths()
+
+def load_vault() -> dict:
+    return backend().load()
+
+def get_entry(site: str) -> dict | None:
+    # One entry without loading the vault (where the backend can)
+    return backend().get(site)
+
+def entry_accounts(site: str) -> list[str]:
+    # Entry names of every account stored for site
+    return backend().accounts(site)
+
+def save_vault(vault: dict, base: dict | None = None) -> None:
+    """Commit vault atomically, writing only what changed.
+
+    With base (the dict load_vault returned before the caller made its
+    changes) it is a compare-and-swap on the whole vault: if any entry was
+    added, changed or removed by another writer since, VersionConflict is
+    raised and nothing is written. Without base, vault wins.
+    """
+    backend().save(vault, base)
+
+def put_entry(site: str, record: dict, expected_rev: int | None = None) -> int:
+    # expected_rev: the record_rev() the caller read (0: must not exist yet);
+    # None writes unconditionally. Returns the entry's new rev.
+    return backend().put(site, record, expected_rev)
+
+def put_entries(records: dict) -> None:
+    # Many entries in one commit: all land or none do
+    backend().put_many(records)
+
+def add_entry(site: str, record: dict) -> str:
+    # A new account for site, never replacing one: stored under site, or
+    # "site (2)", "site (3)", ... if taken. Returns the entry name used.
+    return backend().add(site, record)
+
+def delete_entry(site: str, expected_rev: int | None = None) -> None:
+    backend().delete(site, expected_rev)
+
+def compact_vault() -> None:
+    backend().compact()
+
+def load_meta() -> dict:
+    # Vault-level settings; {} for a plain (format v1) vault
+    return backend().load_meta()
+
+def save_meta(meta: dict) -> None:
+    backend().save_meta(meta)
+
+def vault_salt() -> bytes | None:
+    # Salt for new format v2 entries, or None while the vault is format v1
+    salt = load_meta().get("salt")
+    return base64.b64decode(salt) if salt else None
+
+def entry_settings() -> dict:
+    # Keyword arguments for crypto.encrypt_record when creating an entry:
+    # the vault salt (format v2), calibrated KDF parameters, if any, and
+    # whether entries carry blind index tokens
+    meta = load_meta()
+    salt = meta.get("salt")
+    return {
+        "vault_salt": base64.b64decode(salt) if salt else None,
+        "kdf": meta.get("kdf"),
+        "blind_index": bool(salt and meta.get("blind_index")),
+    }
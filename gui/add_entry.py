@@ -2,8 +2,10 @@ from PyQt6.QtWidgets import (
     QWidget, QFormLayout, QLabel, QLineEdit, QPushButton, QVBoxLayout, QMessageBox
 )
 from PyQt6.QtCore import Qt
-from core.crypto import encrypt_entry
-from core.vault_io import load_vault, save_vault
+from core.agent import encrypt_with_agent
+from core.vault import shared_vault
+from core.vault_io import entry_settings
+from gui.worker import BusyIndicator, job_runner
 
 class AddEntryWidget(QWidget):
     def __init__(self, parent=None, on_back=None):
@@ -56,6 +58,10 @@ class AddEntryWidget(QWidget):
         self.save_btn.clicked.connect(self.save_entry)
         button_layout.addWidget(self.save_btn)
 
+        self.busy = BusyIndicator()
+        self.busy.cancel_requested.connect(self.cancel_jobs)
+        button_layout.addWidget(self.busy)
+
         if self.on_back:
             self.back_btn = QPushButton("← Back")
             self.back_btn.setMinimumHeight(40)
@@ -84,25 +90,57 @@ class AddEntryWidget(QWidget):
         password = self.password_input.text().strip()
         master = self.master_input.text().strip()
 
-        if not (url and username and password and master):
+        # An empty master password means "ask the key agent"; whether it can
+        # is found out in the worker, not with a socket round trip here
+        if not (url and username and password):
             QMessageBox.warning(self, "Error", "Please fill all fields.")
             return
 
-        try:
-            salt, iv, ciphertext = encrypt_entry(master, {
-                "username": username,
-                "password": password
-            })
-
-            vault = load_vault()
-            vault[url] = {"salt": salt, "iv": iv, "ciphertext": ciphertext}
-            save_vault(vault)
-
-            QMessageBox.information(self, "Success", "Entry saved.")
-            self.clear_fields()
-
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Failed to save entry.\n{str(e)}")
+        def encrypt(_):
+            return encrypt_with_agent(master, {"username": username, "password": password}, **entry_settings())
+
+        def write(record):
+            # Never replaces an existing entry: a second account for the
+            # site is stored as "site (2)"; View / Update edits existing ones
+            return shared_vault().add(url, record)
+
+        job = job_runner().submit(
+            ("entry", url),
+            [("Encrypting entry…", encrypt), ("Saving vault…", write)],
+            on_done=self._on_saved,
+            on_error=self._on_save_failed,
+            on_progress=self.busy.set_text,
+            name="gui.save_entry",
+        )
+        if job is None:
+            QMessageBox.warning(self, "Busy", "An operation on this entry is already running.")
+            return
+        self._current_job = ("entry", url)
+        self.save_btn.setEnabled(False)
+        self.busy.start("Encrypting entry…")
+
+    def _on_saved(self, key):
+        self._job_finished()
+        QMessageBox.information(self, "Success", f"Entry saved as '{key}'.")
+        self.clear_fields()
+
+    def _on_save_failed(self, error):
+        self._job_finished()
+        QMessageBox.critical(self, "Error", f"Failed to save entry.\n{error}")
+
+    def _job_finished(self):
+        self._current_job = None
+        self.save_btn.setEnabled(True)
+        self.busy.stop()
+
+    def cancel_jobs(self):
+        key = getattr(self, "_current_job", None)
+        if key:
+            job_runner().cancel(key)
+            self._job_finished()
+
+    def wipe(self):
+        self.clear_fields()
 
     def clear_fields(self):
         self.url_input.clear()
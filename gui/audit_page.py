@@ -0,0 +1,163 @@
+import threading
+
+from PyQt6.QtWidgets import (
+    QWidget, QFormLayout, QLabel, QLineEdit, QPushButton, QVBoxLayout,
+    QMessageBox, QTreeWidget, QTreeWidgetItem
+)
+from PyQt6.QtCore import Qt, pyqtSignal
+
+from core.audit import audit_vault
+from gui.worker import BusyIndicator, job_runner
+
+_SCORE_LABELS = ("very weak", "weak", "fair", "good", "strong")
+_INTRO = ("Checks every entry for reused and weak passwords, and for entries "
+          "that do not open with this master password.")
+
+
+class AuditWidget(QWidget):
+    # Emitted from the audit thread; Qt queues it onto the GUI thread
+    audit_progress = pyqtSignal(int, int)
+
+    def __init__(self, parent=None, on_back=None):
+        super().__init__(parent)
+        self.on_back = on_back
+        self._current_job = None
+        self._cancel = threading.Event()
+
+        self.setMinimumWidth(500)
+        self.setStyleSheet("background: #f4f7fa;")
+
+        # === Layout Setup ===
+        form_layout = QFormLayout()
+        form_layout.setLabelAlignment(Qt.AlignmentFlag.AlignRight)
+        form_layout.setHorizontalSpacing(20)
+
+        label_style = "font-weight: bold; font-size: 15px; color: #185a9d;"
+
+        self.master_input = QLineEdit()
+        self.master_input.setPlaceholderText("Master Password")
+        self.master_input.setEchoMode(QLineEdit.EchoMode.Password)
+        self.master_input.setMinimumHeight(36)
+        self.master_input.returnPressed.connect(self.run_audit)
+        form_layout.addRow(self._styled_label("Master Password:", label_style), self.master_input)
+
+        # === Results ===
+        self.summary = QLabel(_INTRO)
+        self.summary.setWordWrap(True)
+
+        self.results = QTreeWidget()
+        self.results.setHeaderHidden(True)
+        self.results.setMinimumHeight(220)
+        self.results.setStyleSheet("background: #fff; border: 1.5px solid #b2bec3; border-radius: 8px; font-size: 14px;")
+
+        # === Buttons ===
+        button_layout = QVBoxLayout()
+        self.run_btn = QPushButton("🩺 Run Audit")
+        self.run_btn.setMinimumHeight(40)
+        self.run_btn.setStyleSheet("font-size: 16px; font-weight: 500; border-radius: 8px; background: #43cea2; color: white;")
+        self.run_btn.clicked.connect(self.run_audit)
+        button_layout.addWidget(self.run_btn)
+
+        self.busy = BusyIndicator()
+        self.busy.cancel_requested.connect(self.cancel_jobs)
+        button_layout.addWidget(self.busy)
+        self.audit_progress.connect(self._on_progress)
+
+        if self.on_back:
+            self.back_btn = QPushButton("← Back")
+            self.back_btn.setMinimumHeight(40)
+            self.back_btn.setStyleSheet("font-size: 15px; border-radius: 8px; background: #185a9d; color: white;")
+            self.back_btn.clicked.connect(self.on_back)
+            button_layout.addWidget(self.back_btn)
+
+        # === Final Layout ===
+        main_layout = QVBoxLayout()
+        main_layout.addLayout(form_layout)
+        main_layout.addWidget(self.summary)
+        main_layout.addWidget(self.results, 1)
+        main_layout.addLayout(button_layout)
+        self.setLayout(main_layout)
+
+    def _styled_label(self, text, style):
+        label = QLabel(text)
+        label.setStyleSheet(style)
+        return label
+
+    def run_audit(self):
+        master = self.master_input.text().strip()
+        if not master:
+            QMessageBox.warning(self, "Error", "Enter the master password.")
+            return
+
+        self._cancel.clear()
+        cancelled = self._cancel.is_set
+        progress = self.audit_progress.emit
+
+        def audit(_):
+            return audit_vault(master, on_progress=progress, cancelled=cancelled)
+
+        job = job_runner().submit(
+            ("audit",),
+            [("Decrypting entries…", audit)],
+            on_done=self._on_audited,
+            on_error=self._on_failed,
+            on_progress=self.busy.set_text,
+            name="gui.audit",
+        )
+        if job is None:
+            QMessageBox.warning(self, "Busy", "An audit is already running.")
+            return
+        self._current_job = ("audit",)
+        self.master_input.clear()
+        self.results.clear()
+        self.run_btn.setEnabled(False)
+        self.busy.start("Decrypting entries…")
+
+    def _on_progress(self, done, total):
+        if self._current_job:
+            self.busy.set_text(f"Checked {done} of {total}…")
+
+    def _on_audited(self, report):
+        self._job_finished()
+        self.summary.setText(
+            f"{report['total']} entries · {len(report['failing'])} failing · "
+            f"{len(report['reused'])} reuse groups · {len(report['weak'])} weak"
+        )
+
+        failing = QTreeWidgetItem(self.results, [f"Do not open with this master password ({len(report['failing'])})"])
+        for site in report["failing"]:
+            QTreeWidgetItem(failing, [site])
+
+        reused = QTreeWidgetItem(self.results, [f"Reused passwords ({len(report['reused'])} groups)"])
+        for n, sites in enumerate(report["reused"], 1):
+            group = QTreeWidgetItem(reused, [f"Group {n}: {len(sites)} sites"])
+            for site in sites:
+                QTreeWidgetItem(group, [site])
+
+        weak = QTreeWidgetItem(self.results, [f"Weak passwords ({len(report['weak'])})"])
+        for item in report["weak"]:
+            QTreeWidgetItem(weak, [f"{item['site']} — {_SCORE_LABELS[item['score']]}"])
+
+        for top in (failing, reused, weak):
+            top.setExpanded(top.childCount() <= 50)
+
+    def _on_failed(self, error):
+        self._job_finished()
+        QMessageBox.critical(self, "Error", f"Audit failed.\n{error}")
+
+    def _job_finished(self):
+        self._current_job = None
+        self.run_btn.setEnabled(True)
+        self.busy.stop()
+
+    def wipe(self):
+        # Site names of weak or reused passwords are sensitive too
+        self.master_input.clear()
+        self.results.clear()
+        self.summary.setText(_INTRO)
+
+    def cancel_jobs(self):
+        if self._current_job:
+            self._cancel.set()
+            job_runner().cancel(self._current_job)
+            self._job_finished()
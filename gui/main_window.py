@@ -1,13 +1,18 @@
+import time
+
 from PyQt6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QPushButton, QLabel, QFrame, QListWidget, QListWidgetItem,
-    QSizePolicy
+    QSizePolicy, QStackedWidget
 )
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QTimer
 from PyQt6 import QtCore
 from PyQt6.QtGui import QIcon
+from core import instrument
+from core.crypto import wipe_key_cache
 from gui.add_entry import AddEntryWidget
 from gui.view_entry import ViewEntryWidget
+from gui.audit_page import AuditWidget
 
 
 class MainWindow(QMainWindow):
@@ -15,6 +20,8 @@ class MainWindow(QMainWindow):
         super().__init__()
         self.setWindowTitle("VaultSafe - Offline Password Manager")
         self.setMinimumSize(800, 500)
+        # Ends on the first paint; see paintEvent
+        self._first_paint_start = time.perf_counter()
         self.setup_ui()
 
     def setup_ui(self):
@@ -46,8 +53,11 @@ class MainWindow(QMainWindow):
         add_item.setSizeHint(QtCore.QSize(200, 48))
         view_item = QListWidgetItem(view_icon, "  View Stored Entry")
         view_item.setSizeHint(QtCore.QSize(200, 48))
+        audit_item = QListWidgetItem("  Vault Health")
+        audit_item.setSizeHint(QtCore.QSize(200, 48))
         self.sidebar.addItem(add_item)
         self.sidebar.addItem(view_item)
+        self.sidebar.addItem(audit_item)
         self.sidebar.clicked.connect(self.handle_sidebar_click)
 
         # Sidebar layout with dark mode button at bottom
@@ -70,6 +80,19 @@ class MainWindow(QMainWindow):
         self.content_layout.setSpacing(10)
         self.content_wrapper_layout.addWidget(self.content_frame)
 
+        # === Pages ===
+        # Built once, on first use or on idle after the first paint, then
+        # kept alive; navigation only switches the visible page.
+        self.pages = QStackedWidget()
+        self.content_layout.addWidget(self.pages)
+        self._pages = {}
+        self._page_factories = {
+            "home": self._build_home,
+            "add": lambda: AddEntryWidget(on_back=self.show_home),
+            "view": lambda: ViewEntryWidget(on_back=self.show_home),
+            "audit": lambda: AuditWidget(on_back=self.show_home),
+        }
+
         # === Footer ===
         self.footer = QLabel("VaultSafe v1.0 | Secure Offline Password Manager")
         self.footer.setObjectName("FooterLabel")
@@ -77,10 +100,14 @@ class MainWindow(QMainWindow):
         self.footer.setFixedHeight(36)
         self.main_layout.addWidget(self.footer)
 
-        # Load default view
-        self.show_home()
+        # Live timing stats in the footer when tracing is enabled
+        if instrument.enabled():
+            self.stats_timer = QTimer(self)
+            self.stats_timer.timeout.connect(self.update_stats_footer)
+            self.stats_timer.start(1000)
 
         # === Styles ===
+        # Set before any page exists, so pages are polished once
         self.setStyleSheet("""
             QWidget {
                 font-family: 'Segoe UI', 'Roboto', 'Sans-Serif';
@@ -200,14 +227,43 @@ class MainWindow(QMainWindow):
             }
         """)
 
-    def clear_content(self):
-        while self.content_layout.count():
-            child = self.content_layout.takeAt(0)
-            if child.widget():
-                child.widget().deleteLater()
+        # Load default view
+        self.show_home()
 
-    def show_home(self):
-        self.clear_content()
+    def page(self, name):
+        widget = self._pages.get(name)
+        if widget is None:
+            with instrument.span("gui.build_page"):
+                widget = self._page_factories[name]()
+            self._pages[name] = widget
+            self.pages.addWidget(widget)
+        return widget
+
+    def _prewarm_pages(self):
+        # One page per event-loop pass, so input is never blocked for long
+        for name in self._page_factories:
+            if name not in self._pages:
+                self.page(name)
+                QTimer.singleShot(0, self._prewarm_pages)
+                return
+
+    def show_page(self, name):
+        current = self.pages.currentWidget()
+        target = self.page(name)
+        if current is not None and current is not target:
+            self._leave(current)
+        if hasattr(target, "refresh"):
+            target.refresh()
+        self.pages.setCurrentWidget(target)
+
+    def _leave(self, page):
+        # A hidden page keeps no secrets: stop its jobs and clear its fields
+        if hasattr(page, "cancel_jobs"):
+            page.cancel_jobs()
+        if hasattr(page, "wipe"):
+            page.wipe()
+
+    def _build_home(self):
         welcome = QLabel("""
             <div style='text-align:center;'>
                 <span style='font-size:40px;'>&#128273;</span><br>
@@ -217,18 +273,56 @@ class MainWindow(QMainWindow):
         """)
         welcome.setAlignment(Qt.AlignmentFlag.AlignCenter)
         welcome.setStyleSheet("font-size: 16px; margin-top: 30px;")
-        self.content_layout.addWidget(welcome)
+        return welcome
+
+    def show_home(self):
+        self.show_page("home")
 
     def show_add_entry(self):
-        self.clear_content()
-        self.content_layout.addWidget(AddEntryWidget(on_back=self.show_home))
+        with instrument.span("gui.show_add_entry"):
+            self.show_page("add")
 
     def show_view_entry(self):
-        self.clear_content()
-        self.content_layout.addWidget(ViewEntryWidget(on_back=self.show_home))
+        with instrument.span("gui.show_view_entry"):
+            self.show_page("view")
+
+    def show_audit(self):
+        with instrument.span("gui.show_audit"):
+            self.show_page("audit")
+
+    def update_stats_footer(self):
+        labels = (
+            ("gui.first_paint", "startup"),
+            ("kdf.derive_key", "KDF"),
+            ("io.load_vault", "load"),
+            ("io.put_entry", "write"),
+            ("gui.reveal_entry", "reveal"),
+            ("gui.save_entry", "save"),
+        )
+        stats = instrument.stats()
+        parts = [
+            f"{label} {stats[name]['last'] * 1000:.0f} ms ×{stats[name]['count']}"
+            for name, label in labels if name in stats
+        ]
+        self.footer.setText("VaultSafe v1.0 | " + (" · ".join(parts) or "tracing on"))
 
     def handle_sidebar_click(self, index):
         if index.row() == 0:
             self.show_add_entry()
         elif index.row() == 1:
-            self.show_view_entry()
\ No newline at end of file
+            self.show_view_entry()
+        elif index.row() == 2:
+            self.show_audit()
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if self._first_paint_start is not None:
+            instrument.record("gui.first_paint", time.perf_counter() - self._first_paint_start)
+            self._first_paint_start = None
+            QTimer.singleShot(0, self._prewarm_pages)
+
+    def closeEvent(self, event):
+        for page in self._pages.values():
+            self._leave(page)
+        wipe_key_cache()
+        super().closeEvent(event)
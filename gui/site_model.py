@@ -0,0 +1,92 @@
+from PyQt6.QtCore import QAbstractListModel, QModelIndex, Qt
+
+from core.site_index import SiteIndex
+
+
+class SiteListModel(QAbstractListModel):
+    """List model over a SiteIndex, optionally narrowed by a type-ahead filter.
+
+    Views only ask for the rows they paint, so no per-site item objects are
+    created. Unfiltered additions and removals are reported as single-row
+    inserts/removes instead of a full reset.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.sites = SiteIndex()
+        self._query = ""
+        self._rows = self.sites.sites
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        if role in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole):
+            return self._rows[index.row()]
+        return None
+
+    def row_of(self, site):
+        try:
+            return self._rows.index(site) if self._query else self.sites.row(site)
+        except ValueError:
+            return None
+
+    def reset_sites(self, sites):
+        self.beginResetModel()
+        self.sites = SiteIndex(sites)
+        self._rows = self._filtered()
+        self.endResetModel()
+
+    def sync_sites(self, sites):
+        # Apply the difference to the current index, so a reload keeps its
+        # trigram map instead of starting over
+        sites = set(sites)
+        current = set(self.sites.sites)
+        removed, added = current - sites, sites - current
+        if self._query:
+            for site in removed:
+                self.sites.remove(site)
+            for site in added:
+                self.sites.add(site)
+            if removed or added:
+                self.set_filter(self._query)
+            return
+        for site in removed:
+            self.remove_site(site)
+        for site in added:
+            self.add_site(site)
+
+    def set_filter(self, query):
+        self.beginResetModel()
+        self._query = query.strip()
+        self._rows = self._filtered()
+        self.endResetModel()
+
+    def _filtered(self):
+        return self.sites.search(self._query) if self._query else self.sites.sites
+
+    def add_site(self, site):
+        if site in self.sites:
+            return
+        if self._query:
+            self.sites.add(site)
+            self.set_filter(self._query)
+            return
+        row = self.sites.insert_position(site)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.sites.add(site)
+        self.endInsertRows()
+
+    def remove_site(self, site):
+        if site not in self.sites:
+            return
+        if self._query:
+            self.sites.remove(site)
+            self.set_filter(self._query)
+            return
+        row = self.sites.row(site)
+        self.beginRemoveRows(QModelIndex(), row, row)
+        self.sites.remove(site)
+        self.endRemoveRows()
@@ -0,0 +1,33 @@
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+
+from core.vault import shared_vault
+
+REFRESH_INTERVAL_MS = 1500  # stat() poll for writes made by other processes
+
+
+class VaultNotifier(QObject):
+    """Re-emits shared vault changes as a Qt signal on the GUI thread.
+
+    Vault listeners may fire on worker threads; emitting a signal from there
+    is queued to the receivers' thread, so widgets can update safely.
+    """
+
+    changed = pyqtSignal(object)  # set of sites, or None after a reload
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.vault = shared_vault()
+        self.vault.subscribe(self.changed.emit)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.vault.refresh)
+        self.timer.start(REFRESH_INTERVAL_MS)
+
+
+_notifier = None
+
+def vault_notifier():
+    global _notifier
+    if _notifier is None:
+        _notifier = VaultNotifier()
+    return _notifier
@@ -1,19 +1,30 @@
+import time
+
 from PyQt6.QtWidgets import (
     QWidget, QFormLayout, QLabel, QLineEdit, QPushButton, QComboBox,
-    QMessageBox, QVBoxLayout
+    QMessageBox, QVBoxLayout, QInputDialog
 )
 from PyQt6.QtCore import QTimer, Qt
 from PyQt6.QtGui import QGuiApplication
 
-from core.vault_io import load_vault, save_vault
-from core.crypto import decrypt_entry, encrypt_entry
+from core.vault import shared_vault
+from core.vault_io import entry_settings, record_rev
+from core.attachments import link_attachments
+from core.history import list_revisions, restore_revision, save_replaced
+from core.agent import AgentUnavailable, agent_available, decrypt_with_agent, encrypt_with_agent
+from gui.worker import BusyIndicator, job_runner
+from gui.vault_notifier import vault_notifier
+from gui.site_model import SiteListModel
+
+TRIGRAM_SLICE = 1000  # sites indexed per event-loop pass, roughly 20 ms
 
 
 class ViewEntryWidget(QWidget):
     def __init__(self, parent=None, on_back=None):
         super().__init__(parent)
         self.on_back = on_back
-        self.vault = load_vault()
+        self.vault = shared_vault()
+        self.vault.refresh()
 
         # === Layout Setup ===
         form_layout = QFormLayout()
@@ -24,10 +35,23 @@ class ViewEntryWidget(QWidget):
 
         label_style = "font-weight: bold; font-size: 15px; color: #185a9d;"
 
+        # === Site Search ===
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Type to filter sites…")
+        self.search_input.setMinimumHeight(36)
+        self.search_input.textChanged.connect(self._on_search_changed)
+        form_layout.addRow(self._styled_label("Search:", label_style), self.search_input)
+
         # === Site ComboBox ===
+        # Filled on the next event-loop pass so page construction never waits
+        # on sorting a large vault.
+        self.site_model = SiteListModel(self)
         self.site_combo = QComboBox()
         self.site_combo.setMinimumHeight(36)
-        self.site_combo.addItems(sorted(self.vault.keys()))
+        self.site_combo.setModel(self.site_model)
+        self.site_combo.view().setUniformItemSizes(True)
+        QTimer.singleShot(0, self._load_sites)
+        vault_notifier().changed.connect(self._on_vault_changed)
         form_layout.addRow(self._styled_label("Select Website:", label_style), self.site_combo)
 
         # === Master Password Input ===
@@ -60,11 +84,19 @@ class ViewEntryWidget(QWidget):
         self.update_btn.setMinimumHeight(40)
         self.update_btn.setStyleSheet("font-size: 15px; border-radius: 8px; background: #f39c12; color: white;")
         self.update_btn.setEnabled(False)
+        self.history_btn = QPushButton("🕘 Restore Earlier Version")
+        self.history_btn.setMinimumHeight(40)
+        self.history_btn.setStyleSheet("font-size: 15px; border-radius: 8px; background: #6c5ce7; color: white;")
 
         btn_layout = QVBoxLayout()
         btn_layout.addWidget(self.reveal_btn)
         btn_layout.addWidget(self.copy_btn)
         btn_layout.addWidget(self.update_btn)
+        btn_layout.addWidget(self.history_btn)
+
+        self.busy = BusyIndicator()
+        self.busy.cancel_requested.connect(self.cancel_jobs)
+        btn_layout.addWidget(self.busy)
 
         if self.on_back:
             self.back_btn = QPushButton("← Back")
@@ -76,6 +108,7 @@ class ViewEntryWidget(QWidget):
         self.reveal_btn.clicked.connect(self.reveal_entry)
         self.copy_btn.clicked.connect(self.copy_to_clipboard)
         self.update_btn.clicked.connect(self.update_entry)
+        self.history_btn.clicked.connect(self.restore_entry)
         if self.on_back:
             self.back_btn.clicked.connect(self.on_back)
 
@@ -91,6 +124,34 @@ class ViewEntryWidget(QWidget):
 
         self.setStyleSheet("background: #f4f7fa;")
 
+    def _load_sites(self):
+        self.site_model.reset_sites(self.vault.sites())
+        self.site_combo.setCurrentIndex(0 if self.site_model.rowCount() else -1)
+        # Warm the substring index while the user is still reading the page,
+        # a slice per event-loop pass so input is never held up
+        QTimer.singleShot(0, self._warm_trigrams)
+
+    def _warm_trigrams(self):
+        if not self.site_model.sites.build_trigrams(TRIGRAM_SLICE):
+            QTimer.singleShot(0, self._warm_trigrams)
+
+    def _on_search_changed(self, text):
+        self.site_model.set_filter(text)
+        self.site_combo.setCurrentIndex(0 if self.site_model.rowCount() else -1)
+
+    def _on_vault_changed(self, sites):
+        current = self.site_combo.currentText()
+        if sites is None:
+            self.site_model.sync_sites(self.vault.sites())
+        else:
+            for site in sites:
+                if site in self.vault:
+                    self.site_model.add_site(site)
+                else:
+                    self.site_model.remove_site(site)
+        row = self.site_model.row_of(current) if current else None
+        self.site_combo.setCurrentIndex(row if row is not None else (0 if self.site_model.rowCount() else -1))
+
     def _styled_label(self, text, style):
         label = QLabel(text)
         label.setStyleSheet(style)
@@ -100,22 +161,43 @@ class ViewEntryWidget(QWidget):
         site = self.site_combo.currentText()
         master = self.master_input.text().strip()
 
-        if not site or not master:
+        # An empty master password means "ask the key agent"; the worker
+        # finds out whether it can, not a socket round trip here
+        if not site:
             QMessageBox.warning(self, "Error", "Select a site and enter master password.")
             return
 
-        try:
-            record = self.vault[site]
-            data = decrypt_entry(master, record["salt"], record["iv"], record["ciphertext"])
-            self.username_display.setText(data.get("username", "???"))
-            self.password_display.setText(data.get("password", "???"))
-            self.username_display.setReadOnly(False)
-            self.password_display.setReadOnly(False)
-            self.update_btn.setEnabled(True)
-            self._current_site = site
-            self._current_master = master
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Failed to decrypt: {str(e)}")
+        record = self.vault.get(site)
+        if record is None:
+            QMessageBox.warning(self, "Error", "This entry no longer exists.")
+            return
+
+        def decrypt(_):
+            return decrypt_with_agent(master, record)
+
+        started = self._start_job(
+            site,
+            [("Deriving key…", decrypt)],
+            on_done=lambda data: self._on_revealed(site, master, data, record_rev(record)),
+            on_error=lambda error: self._on_failed(f"Failed to decrypt: {error}"),
+            name="gui.reveal_entry",
+        )
+        if started:
+            self.busy.start("Deriving key…")
+
+    def _on_revealed(self, site, master, data, rev):
+        self._job_finished()
+        self.username_display.setText(data.get("username", "???"))
+        self.password_display.setText(data.get("password", "???"))
+        self.username_display.setReadOnly(False)
+        self.password_display.setReadOnly(False)
+        self.update_btn.setEnabled(True)
+        self._current_site = site
+        self._current_master = master
+        self._current_rev = rev
+        self._current_data = data
+        # Attachments and any other fields ride along on update
+        self._current_extra = {k: v for k, v in data.items() if k not in ("username", "password")}
 
     def copy_to_clipboard(self):
         QGuiApplication.clipboard().setText(self.password_display.text())
@@ -125,7 +207,7 @@ class ViewEntryWidget(QWidget):
     def update_entry(self):
         site = getattr(self, '_current_site', None)
         master = getattr(self, '_current_master', None)
-        if not site or not master:
+        if not site or master is None:
             QMessageBox.warning(self, "Error", "Reveal credentials first.")
             return
         username = self.username_display.text().strip()
@@ -133,13 +215,126 @@ class ViewEntryWidget(QWidget):
         if not (username and password):
             QMessageBox.warning(self, "Error", "Username and password cannot be empty.")
             return
-        try:
-            salt, iv, ciphertext = encrypt_entry(master, {"username": username, "password": password})
-            self.vault[site] = {"salt": salt, "iv": iv, "ciphertext": ciphertext}
-            save_vault(self.vault)
-            QMessageBox.information(self, "Success", "Entry updated.")
-            self.username_display.setReadOnly(True)
-            self.password_display.setReadOnly(True)
-            self.update_btn.setEnabled(False)
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Failed to update entry.\n{str(e)}")
+
+        data = {**self._current_extra, "username": username, "password": password}
+        old_data = self._current_data
+        rev = self._current_rev
+
+        def encrypt(_):
+            return link_attachments(encrypt_with_agent(master, data, **entry_settings()), data)
+
+        def write(record):
+            # Keep what is being replaced; after a wrong-password reveal
+            # that is the stored record itself
+            save_replaced(master, site, old_data, data, rev)
+            # Fails with VersionConflict if another window or process wrote
+            # this entry since it was revealed
+            self.vault.put(site, record, expected_rev=rev)
+
+        started = self._start_job(
+            site,
+            [("Encrypting entry…", encrypt), ("Saving vault…", write)],
+            on_done=self._on_updated,
+            on_error=lambda error: self._on_failed(f"Failed to update entry.\n{error}"),
+            name="gui.update_entry",
+        )
+        if started:
+            self.busy.start("Encrypting entry…")
+
+    def restore_entry(self):
+        site = self.site_combo.currentText()
+        master = self.master_input.text().strip()
+        if not site:
+            QMessageBox.warning(self, "Error", "Select a site and enter master password.")
+            return
+        revisions = list_revisions(site)
+        if not revisions:
+            QMessageBox.information(self, "History", "This entry has no earlier versions.")
+            return
+
+        labels = [f"Revision {r['rev']} (replaced {time.strftime('%Y-%m-%d %H:%M', time.localtime(r['time']))})"
+                  for r in revisions]
+        label, ok = QInputDialog.getItem(self, "Restore Earlier Version", "Version to restore:", labels, 0, False)
+        if not ok:
+            return
+        rev = revisions[labels.index(label)]["rev"]
+
+        def restore(_):
+            # Without a password restore_revision checks nothing, so an
+            # unlocked agent has to stand in for it
+            if not master and not agent_available():
+                raise AgentUnavailable("The key agent is not unlocked; enter the master password.")
+            return restore_revision(master, site, rev)
+
+        started = self._start_job(
+            site,
+            [("Restoring version…", restore)],
+            on_done=lambda _: self._on_restored(site, rev),
+            on_error=lambda error: self._on_failed(f"Failed to restore.\n{error}"),
+            name="gui.restore_entry",
+        )
+        if started:
+            self.busy.start("Restoring version…")
+
+    def _on_restored(self, site, rev):
+        self._job_finished()
+        self.username_display.clear()
+        self.password_display.clear()
+        self.username_display.setReadOnly(True)
+        self.password_display.setReadOnly(True)
+        self._current_site = None
+        self.update_btn.setEnabled(False)
+        QMessageBox.information(self, "Restored", f"Revision {rev} of '{site}' restored. Reveal it to check.")
+
+    def _on_updated(self, _):
+        self._job_finished()
+        QMessageBox.information(self, "Success", "Entry updated.")
+        self.username_display.setReadOnly(True)
+        self.password_display.setReadOnly(True)
+        self.update_btn.setEnabled(False)
+
+    def _on_failed(self, message):
+        self._job_finished()
+        QMessageBox.critical(self, "Error", message)
+
+    def _start_job(self, site, steps, on_done, on_error, name):
+        key = ("entry", site)
+        job = job_runner().submit(key, steps, on_done, on_error, self.busy.set_text, name)
+        if job is None:
+            QMessageBox.warning(self, "Busy", "An operation on this entry is already running.")
+            return False
+        self._current_job = key
+        self.reveal_btn.setEnabled(False)
+        self.update_btn.setEnabled(False)
+        self.history_btn.setEnabled(False)
+        return True
+
+    def _job_finished(self):
+        self._current_job = None
+        self.reveal_btn.setEnabled(True)
+        self.history_btn.setEnabled(True)
+        self.update_btn.setEnabled(getattr(self, '_current_site', None) is not None)
+        self.busy.stop()
+
+    def refresh(self):
+        # Cheap stat() check; the notifier applies any changes to the list
+        self.vault.refresh()
+
+    def wipe(self):
+        self.master_input.clear()
+        self.username_display.clear()
+        self.password_display.clear()
+        self.username_display.setReadOnly(True)
+        self.password_display.setReadOnly(True)
+        self.update_btn.setEnabled(False)
+        self._current_site = None
+        self._current_master = None
+        self._current_rev = None
+        self._current_data = None
+        self._current_extra = {}
+
+    def cancel_jobs(self):
+        key = getattr(self, "_current_job", None)
+        if key:
+            job_runner().cancel(key)
+            self._job_finished()
@@ -0,0 +1,140 @@
+import threading
+
+from PyQt6.QtWidgets import QWidget, QHBoxLayout, QLabel, QProgressBar, QPushButton
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+from core.instrument import span
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobSignals(QObject):
+    progress = pyqtSignal(str)
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    done = pyqtSignal()
+
+
+class Job(QRunnable):
+    """Runs a list of (label, step) pairs off the GUI thread.
+
+    Each step receives the previous step's result. Cancellation is checked
+    between steps, so a cancelled job never reaches a later write step.
+    """
+
+    def __init__(self, key, steps, name="gui.job"):
+        super().__init__()
+        self.key = key
+        self.steps = steps
+        self.name = name
+        self.signals = JobSignals()
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def run(self):
+        result = None
+        try:
+            with span(self.name):
+                for label, step in self.steps:
+                    if self.cancelled:
+                        raise JobCancelled()
+                    self.signals.progress.emit(label)
+                    result = step(result)
+            if not self.cancelled:
+                self.signals.finished.emit(result)
+        except JobCancelled:
+            pass
+        except Exception as e:
+            if not self.cancelled:
+                self.signals.failed.emit(str(e))
+        finally:
+            self.signals.done.emit()
+
+
+class JobRunner(QObject):
+    """Thread-pool front end that allows at most one job per key."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool.globalInstance()
+        self._active = {}
+
+    def is_busy(self, key):
+        return key in self._active
+
+    def submit(self, key, steps, on_done, on_error=None, on_progress=None, name="gui.job"):
+        # name is the instrumentation span; keep it a fixed string, never a site
+        if key in self._active:
+            return None
+
+        job = Job(key, steps, name)
+        job.signals.finished.connect(on_done)
+        if on_error:
+            job.signals.failed.connect(on_error)
+        if on_progress:
+            job.signals.progress.connect(on_progress)
+        job.signals.done.connect(lambda: self._active.pop(key, None))
+
+        self._active[key] = job
+        self.pool.start(job)
+        return job
+
+    def cancel(self, key):
+        job = self._active.get(key)
+        if job:
+            job.cancel()
+
+
+_runner = None
+
+def job_runner():
+    # Shared so that two pages can't race on the same entry
+    global _runner
+    if _runner is None:
+        _runner = JobRunner()
+    return _runner
+
+
+class BusyIndicator(QWidget):
+    cancel_requested = pyqtSignal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+
+        self.label = QLabel()
+        self.label.setStyleSheet("color: #185a9d; font-size: 13px;")
+
+        self.bar = QProgressBar()
+        self.bar.setRange(0, 0)  # indeterminate
+        self.bar.setTextVisible(False)
+        self.bar.setFixedHeight(10)
+
+        self.cancel_btn = QPushButton("Cancel")
+        self.cancel_btn.setMinimumHeight(28)
+        self.cancel_btn.setStyleSheet("font-size: 13px; border-radius: 8px; background: #888; color: white; min-width: 80px;")
+        self.cancel_btn.clicked.connect(self.cancel_requested)
+
+        layout = QHBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.label)
+        layout.addWidget(self.bar, 1)
+        layout.addWidget(self.cancel_btn)
+        self.hide()
+
+    def start(self, text=""):
+        self.label.setText(text)
+        self.show()
+
+    def set_text(self, text):
+        self.label.setText(text)
+
+    def stop(self):
+        self.hide()
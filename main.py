@@ -2,10 +2,13 @@
 
 import sys
 from PyQt6.QtWidgets import QApplication
+from core.crypto import enable_key_cache, wipe_key_cache
 from gui.main_window import MainWindow
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
+    enable_key_cache()
+    app.aboutToQuit.connect(wipe_key_cache)
     window = MainWindow()
     window.show()
     sys.exit(app.exec())
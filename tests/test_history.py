@@ -0,0 +1,53 @@
+import pytest
+
+from core import history, vault_io
+from core.crypto import decrypt_record, decrypt_record_strict, encrypt_record
+
+FAST_KDF = {"alg": "pbkdf2-sha512", "iterations": 1000}
+
+
+@pytest.fixture
+def vault(tmp_path, monkeypatch):
+    monkeypatch.setattr(vault_io, "VAULT_FILE", str(tmp_path / "vault.json"))
+    vault_io.save_meta({"kdf": FAST_KDF})
+
+
+def _put(master, site, data, expected_rev=None):
+    return vault_io.put_entry(site, encrypt_record(master, data, **vault_io.entry_settings()), expected_rev)
+
+
+def test_update_after_wrong_master_reveal_keeps_stored_record(vault):
+    good = {"username": "me", "password": "right"}
+    rev = _put("correct", "site.com", good)
+
+    # Reveal with the wrong master password shows the decoy; Update then
+    # re-encrypts the edited fields under that wrong password
+    revealed = decrypt_record("wrong", vault_io.get_entry("site.com"))
+    assert revealed == {"username": "???", "password": "???"}
+    edited = {"username": "me", "password": "typo"}
+    history.save_replaced("wrong", "site.com", revealed, edited, rev)
+    _put("wrong", "site.com", edited, expected_rev=rev)
+
+    (revision,) = history.list_revisions("site.com")
+    assert revision["rev"] == rev
+    assert history.open_revision("correct", "site.com", rev) == good
+
+
+def test_update_with_plaintext_keeps_revision(vault):
+    old = {"username": "me", "password": "one"}
+    rev = _put("m", "site.com", old)
+    new = {"username": "me", "password": "two"}
+    history.save_replaced("m", "site.com", old, new, rev)
+    _put("m", "site.com", new, expected_rev=rev)
+
+    assert history.open_revision("m", "site.com", rev) == old
+    restored = history.restore_revision("m", "site.com", rev)
+    assert decrypt_record_strict("m", vault_io.get_entry("site.com")) == old
+    assert restored == rev + 2
+
+
+def test_unchanged_update_keeps_nothing(vault):
+    data = {"username": "me", "password": "same"}
+    rev = _put("m", "site.com", data)
+    history.save_replaced("m", "site.com", data, dict(data), rev)
+    assert history.list_revisions("site.com") == []
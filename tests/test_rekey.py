@@ -0,0 +1,32 @@
+import pytest
+
+from core import history, vault_io
+from core.crypto import encrypt_record
+from core.rekey import rekey_vault
+
+FAST_KDF = {"alg": "pbkdf2-sha512", "iterations": 1000}
+
+
+@pytest.fixture
+def vault(tmp_path, monkeypatch):
+    monkeypatch.setattr(vault_io, "VAULT_FILE", str(tmp_path / "vault.json"))
+    vault_io.save_meta({"kdf": FAST_KDF})
+
+
+def _put(master, site, data, expected_rev=None):
+    return vault_io.put_entry(site, encrypt_record(master, data, **vault_io.entry_settings()), expected_rev)
+
+
+def test_rekey_keeps_history_saved_under_another_password(vault):
+    one = {"username": "me", "password": "one"}
+    stray = {"username": "me", "password": "stray"}
+    rev = _put("old", "site.com", one)
+    history.save_revision("other", "site.com", stray, rev)
+    rev = _put("old", "site.com", {"username": "me", "password": "two"}, expected_rev=rev)
+    history.save_revision("old", "site.com", one, rev)
+
+    assert rekey_vault("old", "new", max_workers=1) == {"rekeyed": 1, "history_skipped": 1}
+
+    newer, older = history.list_revisions("site.com")
+    assert history.open_revision("new", "site.com", newer["rev"]) == one
+    assert history.open_revision("other", "site.com", older["rev"]) == stray
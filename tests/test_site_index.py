@@ -0,0 +1,29 @@
+from core.site_index import SiteIndex
+
+
+def test_sliced_build_matches_full_build():
+    sites = [f"site-{i:04}.example" for i in range(250)]
+    sliced = SiteIndex(sites)
+    while not sliced.build_trigrams(40):
+        pass
+    full = SiteIndex(sites)
+    full.build_trigrams()
+    assert sliced._trigrams == full._trigrams
+
+
+def test_changes_during_a_sliced_build_are_kept():
+    index = SiteIndex(["alpha.com", "beta.com", "gamma.com"])
+    assert not index.build_trigrams(1)
+    index.remove("gamma.com")
+    index.add("delta.com")
+    while not index.build_trigrams(1):
+        pass
+    assert index.search("mma") == []
+    assert index.search("elt") == ["delta.com"]
+    assert index.search("eta") == ["beta.com"]
+
+
+def test_search_finishes_a_partial_build():
+    index = SiteIndex(["mail.example", "example.org", "other.net"])
+    index.build_trigrams(1)
+    assert index.search("exam") == ["example.org", "mail.example"]
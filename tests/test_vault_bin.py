@@ -0,0 +1,43 @@
+import struct
+
+import pytest
+
+from core.vault_bin import _HEADER, BinaryVault, BinaryVaultError, write_binary_vault
+
+VAULT = {f"site{i}.com": {"salt": "c2FsdA==", "iv": "aXY=", "ciphertext": "Y3Q=", "v": 2} for i in range(5)}
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = str(tmp_path / "vault.bin")
+    write_binary_vault(VAULT, path)
+    return path
+
+
+def test_round_trip(path):
+    with BinaryVault(path) as bv:
+        assert bv.to_dict() == VAULT
+        assert bv.get("site3.com") == VAULT["site3.com"]
+
+
+def test_count_beyond_file_size_is_rejected_at_open(path):
+    with open(path, "r+b") as f:
+        f.seek(_HEADER.size - 4)
+        f.write(struct.pack("<I", 1_000_000))
+    with pytest.raises(BinaryVaultError, match="truncated"):
+        BinaryVault(path)
+
+
+def test_truncated_records_raise_format_error(path):
+    with open(path, "r+b") as f:
+        f.truncate(f.seek(0, 2) - 3)
+    with BinaryVault(path) as bv, pytest.raises(BinaryVaultError, match="corrupt"):
+        bv.to_dict()
+
+
+def test_slot_offset_outside_file_raises_format_error(path):
+    with open(path, "r+b") as f:
+        f.seek(_HEADER.size + 8)
+        f.write(struct.pack("<Q", 2 ** 40))
+    with BinaryVault(path) as bv, pytest.raises(BinaryVaultError, match="corrupt"):
+        bv.sites()
@@ -0,0 +1,5 @@
+import sys
+
+from vaultsafe.cli import main
+
+sys.exit(main())
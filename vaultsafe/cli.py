@@ -0,0 +1,478 @@
+# Headless command line interface: python -m vaultsafe <command>
+#
+# Only core.vault_io is imported up front. Anything that pulls in the
+# cryptography package (core.crypto, core.rekey) is imported inside the
+# command that needs it, so `list` starts without paying for it. PyQt is
+# never imported.
+
+import os
+import sys
+import json
+import argparse
+import getpass
+
+from core import vault_io
+
+
+class CliError(Exception):
+    pass
+
+
+def _emit(payload) -> None:
+    json.dump(payload, sys.stdout)
+    sys.stdout.write("\n")
+
+def _read_secret(args, prompt: str) -> str:
+    # One secret per stdin line with --stdin, otherwise an interactive prompt
+    if args.stdin:
+        line = sys.stdin.readline()
+        if not line:
+            raise CliError(f"Expected {prompt.lower()} on stdin.")
+        secret = line.rstrip("\r\n")
+    else:
+        secret = getpass.getpass(f"{prompt}: ")
+    if not secret:
+        raise CliError(f"{prompt} cannot be empty.")
+    return secret
+
+
+def cmd_list(args) -> None:
+    _emit(sorted(vault_io.load_vault()))
+
+def cmd_accounts(args) -> None:
+    _emit(vault_io.entry_accounts(args.site))
+
+def cmd_get(args) -> None:
+    if args.rev is not None:
+        from core.history import HistoryError, open_revision
+        master = _read_secret(args, "Master password")
+        try:
+            data = open_revision(master, args.site, args.rev)
+        except HistoryError as e:
+            raise CliError(str(e)) from None
+        _emit({"site": args.site, "rev": args.rev,
+               "username": data.get("username", "???"), "password": data.get("password", "???")})
+        return
+
+    if args.binary:
+        from core.vault_bin import BinaryVault, BinaryVaultError
+        try:
+            with BinaryVault(args.binary) as bv:
+                record = bv.get(args.site)
+        except (BinaryVaultError, OSError) as e:
+            raise CliError(str(e)) from None
+    else:
+        record = vault_io.get_entry(args.site)
+    if record is None:
+        raise CliError(f"No entry for '{args.site}'.")
+
+    data = _agent().agent_decrypt(record) if args.agent else None
+    if data is None:
+        from core.crypto import decrypt_record
+        master = _read_secret(args, "Master password")
+        data = decrypt_record(master, record)
+    _emit({"site": args.site, "username": data.get("username", "???"), "password": data.get("password", "???")})
+
+def cmd_put(args) -> None:
+    settings = vault_io.entry_settings()
+    use_agent = args.agent and settings["vault_salt"] is not None and _agent().agent_available()
+    master = "" if use_agent else _read_secret(args, "Master password")
+    password = _read_secret(args, "Entry password")
+    data = {"username": args.username, "password": password}
+    if args.tag:
+        data["tags"] = args.tag
+    if use_agent:
+        record = _agent().agent_encrypt(data, **settings)
+        if record is None:
+            raise CliError("The key agent cannot encrypt for this vault; run `agent unlock` first.")
+    else:
+        from core.crypto import encrypt_record
+        record = encrypt_record(master, data, **settings)
+    if args.add:
+        _emit({"site": vault_io.add_entry(args.site, record), "saved": True})
+        return
+    old = vault_io.get_entry(args.site)
+    if old is not None:
+        from core.history import save_record
+        save_record(args.site, old)
+    vault_io.put_entry(args.site, record, vault_io.record_rev(old))
+    _emit({"site": args.site, "saved": True})
+
+def cmd_history(args) -> None:
+    from core.history import list_revisions
+    _emit({"site": args.site, "revisions": list_revisions(args.site)})
+
+def cmd_restore(args) -> None:
+    from core.history import HistoryError, restore_revision
+
+    master = _read_secret(args, "Master password")
+    try:
+        rev = restore_revision(master, args.site, args.rev)
+    except HistoryError as e:
+        raise CliError(str(e)) from None
+    _emit({"site": args.site, "restored": args.rev, "rev": rev})
+
+def cmd_search(args) -> None:
+    from core.search import SearchError, search_entries
+
+    master = "" if args.agent else _read_secret(args, "Master password")
+    try:
+        result = search_entries(master, args.term)
+    except (SearchError, _agent().AgentUnavailable) as e:
+        raise CliError(str(e)) from None
+    _emit({"term": args.term, **result})
+
+def cmd_index(args) -> None:
+    from core.search import SearchError, build_index
+
+    master = _read_secret(args, "Master password")
+    try:
+        count = build_index(master, on_progress=_progress_printer(args, "done", "total"))
+    except SearchError as e:
+        raise CliError(str(e)) from None
+    _emit({"indexed": count})
+
+def cmd_rekey(args) -> None:
+    from core.rekey import RekeyError, rekey_vault
+
+    old = _read_secret(args, "Current master password")
+    new = _read_secret(args, "New master password")
+
+    def progress(done, total):
+        if args.progress:
+            sys.stderr.write(json.dumps({"done": done, "total": total}) + "\n")
+
+    try:
+        result = rekey_vault(old, new, on_progress=progress)
+    except RekeyError as e:
+        raise CliError(str(e)) from None
+    _emit(result)
+
+def cmd_migrate(args) -> None:
+    from core.rekey import RekeyError, migrate_to_v2
+
+    master = _read_secret(args, "Master password")
+    try:
+        count = migrate_to_v2(master)
+    except RekeyError as e:
+        raise CliError(str(e)) from None
+    _emit({"migrated": count})
+
+def cmd_to_binary(args) -> None:
+    from core.vault_bin import BinaryVaultError, json_to_binary
+
+    try:
+        count = json_to_binary(args.file)
+    except (BinaryVaultError, OSError) as e:
+        raise CliError(str(e)) from None
+    _emit({"converted": count, "file": args.file})
+
+def cmd_from_binary(args) -> None:
+    from core.vault_bin import BinaryVaultError, binary_to_json
+
+    try:
+        count = binary_to_json(args.file)
+    except (BinaryVaultError, OSError) as e:
+        raise CliError(str(e)) from None
+    _emit({"converted": count, "vault": args.vault})
+
+def cmd_to_sqlite(args) -> None:
+    from core.sqlite_store import SqliteStoreError, migrate_json_to_sqlite
+
+    try:
+        count = migrate_json_to_sqlite(args.vault, args.database)
+    except (SqliteStoreError, OSError) as e:
+        raise CliError(str(e)) from None
+    _emit({"copied": count, "vault": args.database})
+
+
+def _progress_printer(args, *fields):
+    def progress(*values):
+        if args.progress:
+            sys.stderr.write(json.dumps(dict(zip(fields, values))) + "\n")
+    return progress
+
+def cmd_import(args) -> None:
+    from core.transfer import EXPORT_FORMAT, TransferError, detect_format, import_file
+
+    try:
+        fmt = args.format or detect_format(args.file)
+        master = _read_secret(args, "Master password")
+        export_password = _read_secret(args, "Export password") if fmt == EXPORT_FORMAT else None
+        counts = import_file(args.file, master, fmt, export_password, overwrite=args.overwrite,
+                             on_progress=_progress_printer(args, "imported", "skipped"))
+    except (TransferError, OSError) as e:
+        raise CliError(str(e)) from None
+    _emit(counts)
+
+def cmd_export(args) -> None:
+    from core.transfer import EXPORT_FORMAT, TransferError, export_vault
+
+    master = _read_secret(args, "Master password")
+    export_password = _read_secret(args, "Export password") if args.format == EXPORT_FORMAT else None
+    try:
+        count = export_vault(args.file, master, args.format, export_password,
+                             on_progress=_progress_printer(args, "done", "total"))
+    except (TransferError, OSError) as e:
+        raise CliError(str(e)) from None
+    _emit({"exported": count, "file": args.file, "format": args.format})
+
+
+def cmd_audit(args) -> None:
+    from core.audit import audit_vault
+
+    master = _read_secret(args, "Master password")
+    _emit(audit_vault(master, on_progress=_progress_printer(args, "done", "total")))
+
+
+def cmd_attach(args) -> None:
+    from core.attachments import AttachmentError, add_attachment
+
+    master = _read_secret(args, "Master password")
+    try:
+        with open(args.file, "rb") as src:
+            ref = add_attachment(master, args.site, src, args.name or os.path.basename(args.file))
+    except (AttachmentError, OSError) as e:
+        raise CliError(str(e)) from None
+    _emit({"site": args.site, "attached": ref})
+
+def cmd_attachments(args) -> None:
+    from core.attachments import AttachmentError, list_attachments
+
+    master = _read_secret(args, "Master password")
+    try:
+        _emit({"site": args.site, "attachments": list_attachments(master, args.site)})
+    except AttachmentError as e:
+        raise CliError(str(e)) from None
+
+def cmd_extract(args) -> None:
+    from core.attachments import AttachmentError, extract_attachment
+    from core.crypto import DecryptionError
+
+    master = _read_secret(args, "Master password")
+    try:
+        if args.output in (None, "-"):
+            extract_attachment(master, args.site, args.id, sys.stdout.buffer)
+            sys.stdout.flush()
+            return
+        tmp_path = args.output + ".tmp"
+        try:
+            with open(tmp_path, "wb") as dst:
+                size = extract_attachment(master, args.site, args.id, dst)
+            os.replace(tmp_path, args.output)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    except (AttachmentError, DecryptionError, OSError) as e:
+        raise CliError(str(e)) from None
+    _emit({"site": args.site, "id": args.id, "file": args.output, "size": size})
+
+def cmd_detach(args) -> None:
+    from core.attachments import AttachmentError, remove_attachment
+
+    master = _read_secret(args, "Master password")
+    try:
+        remove_attachment(master, args.site, args.id)
+    except AttachmentError as e:
+        raise CliError(str(e)) from None
+    _emit({"site": args.site, "detached": args.id})
+
+def cmd_prune(args) -> None:
+    from core.attachments import prune_blobs
+    _emit({"pruned": prune_blobs()})
+
+
+def _agent():
+    from core import agent
+    return agent
+
+def _agent_vaults(vault: dict) -> list[dict]:
+    # One {"vs", "kdf", "check"} per vault key in use, plus the key new
+    # entries will be made under
+    vaults = {}
+    for record in vault.values():
+        if record.get("v") == 2:
+            key = (record["vs"], json.dumps(record.get("kdf"), sort_keys=True))
+            vaults.setdefault(key, {"vs": record["vs"], "kdf": record.get("kdf"), "check": record})
+    settings = vault_io.entry_settings()
+    if settings["vault_salt"] is not None:
+        vs = vault_io.load_meta()["salt"]
+        key = (vs, json.dumps(settings["kdf"], sort_keys=True))
+        vaults.setdefault(key, {"vs": vs, "kdf": settings["kdf"]})
+    return list(vaults.values())
+
+def cmd_agent(args) -> None:
+    agent = _agent()
+    client = agent.AgentClient(args.socket)
+    try:
+        if args.action == "serve":
+            agent.AgentServer(args.socket, args.idle_timeout).serve_forever()
+            return
+        if args.action == "start":
+            if client.ping():
+                raise CliError("Key agent is already running.")
+            _emit({"socket": agent.spawn_agent(args.idle_timeout, args.socket)})
+            return
+        if args.action == "unlock":
+            vaults = _agent_vaults(vault_io.load_vault())
+            if not vaults:
+                raise CliError("This vault has no format v2 keys; run `migrate` first.")
+            master = _read_secret(args, "Master password")
+            response = client.request({"op": "unlock", "password": master, "vaults": vaults})
+        elif args.action == "status":
+            response = client.ping() or {"ok": False, "error": "Key agent is not running."}
+        else:  # lock, stop
+            response = client.request({"op": args.action})
+    except agent.AgentUnavailable as e:
+        raise CliError(str(e)) from None
+    if not response.pop("ok", False):
+        raise CliError(response.get("error", "Key agent request failed."))
+    _emit(response)
+
+
+def cmd_calibrate(args) -> None:
+    from core.kdf import UnsupportedKdf, calibrate
+
+    try:
+        params = calibrate(args.target_ms / 1000, args.alg)
+    except UnsupportedKdf as e:
+        raise CliError(str(e)) from None
+    if args.save:
+        vault_io.save_meta({**vault_io.load_meta(), "kdf": params})
+    _emit({"kdf": params, "saved": args.save})
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="vaultsafe", description="VaultSafe headless CLI")
+    parser.add_argument("--vault", default=vault_io.VAULT_FILE, help="vault file (default: %(default)s)")
+    parser.add_argument("--stdin", action="store_true",
+                        help="read secrets from stdin, one per line, instead of prompting")
+    parser.add_argument("--agent", action="store_true",
+                        help="use the running key agent instead of asking for the master password")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("list", help="list stored sites").set_defaults(func=cmd_list)
+
+    accounts = commands.add_parser("accounts", help="list the entries stored for one site")
+    accounts.add_argument("site")
+    accounts.set_defaults(func=cmd_accounts)
+
+    get = commands.add_parser("get", help="decrypt one entry")
+    get.add_argument("site")
+    get.add_argument("--rev", type=int, help="decrypt this earlier revision from the entry's history")
+    get.add_argument("--binary", metavar="FILE", help="read the entry from a binary vault file (see to-binary)")
+    get.set_defaults(func=cmd_get)
+
+    put = commands.add_parser("put", help="add or replace an entry")
+    put.add_argument("site")
+    put.add_argument("--username", required=True)
+    put.add_argument("--add", action="store_true",
+                     help="store a further account if the site has one, as 'site (2)', ...")
+    put.add_argument("--tag", action="append", help="searchable tag, stored encrypted (repeatable)")
+    put.set_defaults(func=cmd_put)
+
+    search = commands.add_parser("search", help="find entries by username, @domain or tag via the blind index")
+    search.add_argument("term")
+    search.set_defaults(func=cmd_search)
+
+    index = commands.add_parser("index", help="build the blind index and keep it for new entries (format v2)")
+    index.add_argument("--progress", action="store_true", help="report progress as JSON lines on stderr")
+    index.set_defaults(func=cmd_index)
+
+    history = commands.add_parser("history", help="list an entry's earlier revisions, newest first")
+    history.add_argument("site")
+    history.set_defaults(func=cmd_history)
+
+    restore = commands.add_parser("restore", help="make an earlier revision the entry's current content")
+    restore.add_argument("site")
+    restore.add_argument("rev", type=int)
+    restore.set_defaults(func=cmd_restore)
+
+    rekey = commands.add_parser("rekey", help="re-encrypt the vault under a new master password")
+    rekey.add_argument("--progress", action="store_true", help="report progress as JSON lines on stderr")
+    rekey.set_defaults(func=cmd_rekey)
+
+    audit = commands.add_parser("audit", help="report undecryptable, reused and weak passwords")
+    audit.add_argument("--progress", action="store_true", help="report progress as JSON lines on stderr")
+    audit.set_defaults(func=cmd_audit)
+
+    attach = commands.add_parser("attach", help="encrypt a file and attach it to an entry")
+    attach.add_argument("site")
+    attach.add_argument("file")
+    attach.add_argument("--name", help="name to store (default: the file's name)")
+    attach.set_defaults(func=cmd_attach)
+
+    attachments = commands.add_parser("attachments", help="list an entry's attachments")
+    attachments.add_argument("site")
+    attachments.set_defaults(func=cmd_attachments)
+
+    extract = commands.add_parser("extract", help="decrypt an attachment")
+    extract.add_argument("site")
+    extract.add_argument("id")
+    extract.add_argument("-o", "--output", help="file to write (default: stdout)")
+    extract.set_defaults(func=cmd_extract)
+
+    detach = commands.add_parser("detach", help="remove an attachment from an entry")
+    detach.add_argument("site")
+    detach.add_argument("id")
+    detach.set_defaults(func=cmd_detach)
+
+    commands.add_parser("prune", help="delete attachment blobs no entry refers to").set_defaults(func=cmd_prune)
+
+    transfer_formats = ("csv", "bitwarden-json", "vaultsafe-export")
+    import_ = commands.add_parser("import", help="bulk import from CSV, Bitwarden JSON or a VaultSafe export")
+    import_.add_argument("file")
+    import_.add_argument("--format", choices=transfer_formats, help="default: detected from the file")
+    import_.add_argument("--overwrite", action="store_true", help="replace entries whose site already exists")
+    import_.add_argument("--progress", action="store_true", help="report progress as JSON lines on stderr")
+    import_.set_defaults(func=cmd_import)
+
+    export = commands.add_parser("export", help="write every entry to a file")
+    export.add_argument("file")
+    export.add_argument("--format", choices=("vaultsafe-export", "csv"), default="vaultsafe-export",
+                        help="vaultsafe-export is encrypted under an export password; csv is PLAINTEXT")
+    export.add_argument("--progress", action="store_true", help="report progress as JSON lines on stderr")
+    export.set_defaults(func=cmd_export)
+
+    migrate = commands.add_parser("migrate", help="convert the vault to format v2 (one vault key, needed by the agent)")
+    migrate.set_defaults(func=cmd_migrate)
+
+    to_binary = commands.add_parser("to-binary", help="write the vault to a memory-mapped binary file")
+    to_binary.add_argument("file")
+    to_binary.set_defaults(func=cmd_to_binary)
+
+    from_binary = commands.add_parser("from-binary", help="load a binary vault file into an empty vault")
+    from_binary.add_argument("file")
+    from_binary.set_defaults(func=cmd_from_binary)
+
+    to_sqlite = commands.add_parser("to-sqlite", help="copy a JSON vault into a new SQLite vault")
+    to_sqlite.add_argument("database", help="path ending in .db or .sqlite; use it with --vault afterwards")
+    to_sqlite.set_defaults(func=cmd_to_sqlite)
+
+    calibrate = commands.add_parser("calibrate", help="pick KDF parameters for a target unlock time on this machine")
+    calibrate.add_argument("--target-ms", type=int, default=500)
+    calibrate.add_argument("--alg", choices=("pbkdf2-sha512", "scrypt", "argon2id"), default="pbkdf2-sha512")
+    calibrate.add_argument("--save", action="store_true", help="use these parameters for new entries")
+    calibrate.set_defaults(func=cmd_calibrate)
+
+    agent = commands.add_parser("agent", help="control the local key agent")
+    agent.add_argument("action", choices=("start", "serve", "unlock", "lock", "stop", "status"),
+                       help="serve runs the agent in the foreground")
+    agent.add_argument("--idle-timeout", type=int, default=300,
+                       help="seconds without requests before keys are wiped and the agent exits")
+    agent.add_argument("--socket", help="socket path (default: $VAULTSAFE_AGENT_SOCK or per-user runtime dir)")
+    agent.set_defaults(func=cmd_agent)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    vault_io.VAULT_FILE = args.vault
+    try:
+        args.func(args)
+    except (CliError, vault_io.VersionConflict) as e:
+        # VersionConflict: another process wrote the vault mid-command
+        sys.stderr.write(json.dumps({"error": str(e)}) + "\n")
+        return 1
+    return 0